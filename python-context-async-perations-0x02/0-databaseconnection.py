@@ -1,4 +1,16 @@
+import queue
 import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger("databaseconnection")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Queued in place of a connection that was discarded: its slot may be
+# filled by opening a new one.
+_FREE_SLOT = object()
 
 
 class DatabaseConnection:
@@ -36,6 +48,145 @@ class DatabaseConnection:
         return False
 
 
+class ConnectionPool:
+    """
+    A bounded pool of sqlite connections. Connections are opened lazily
+    up to size; further callers wait up to timeout seconds for one to be
+    returned.
+    """
+
+    def __init__(self, db_name, size=5, timeout=30.0):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._open = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                conn = _FREE_SLOT
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"No connection to {self.db_name} "
+                        f"after {self.timeout}s")
+        if conn is not _FREE_SLOT:
+            return conn
+        try:
+            return sqlite3.connect(self.db_name, check_same_thread=False)
+        except sqlite3.Error:
+            self._idle.put(_FREE_SLOT)
+            raise
+
+    def put(self, conn):
+        """
+        Returns conn to the pool, rolling back any open transaction. If
+        that fails the connection is closed and its slot freed instead.
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            self._idle.put(_FREE_SLOT)
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if conn is not _FREE_SLOT:
+                conn.close()
+            with self._lock:
+                self._open -= 1
+
+
+def get_pool(db_name, size=5):
+    """Returns the shared pool for db_name, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name, size)
+        return pool
+
+
+class StreamingCursor:
+    """
+    Wraps a sqlite cursor, adding iter_batches() so large result sets can
+    be consumed in chunks; every other attribute is the cursor's own.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def iter_batches(self, n=1000):
+        """Yields the remaining rows in lists of up to n rows"""
+        while True:
+            rows = self._cursor.fetchmany(n)
+            if not rows:
+                return
+            yield rows
+
+
+class PooledDatabaseConnection:
+    """
+    Like DatabaseConnection, but the connection is taken from a shared
+    pool (get_pool(db_name) unless pool is given) and returned to it on
+    exit instead of being closed. Returns a StreamingCursor. Progress is
+    logged at DEBUG to the "databaseconnection" logger, or to logger.
+    """
+
+    def __init__(self, db_name, pool=None, logger=logger):
+        self.db_name = db_name
+        self.pool = pool if pool is not None else get_pool(db_name)
+        self.logger = logger
+        self.conn = None
+        self.cursor = None
+
+    def __enter__(self):
+        self.conn = self.pool.get()
+        self.cursor = self.conn.cursor()
+        self.logger.debug("Checked out connection to %s", self.db_name)
+        return StreamingCursor(self.cursor)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.cursor.close()
+            if exc_type is None:
+                self.conn.commit()
+                self.logger.debug("Changes committed to %s", self.db_name)
+            else:
+                self.conn.rollback()
+                self.logger.debug("Changes rolled back on %s", self.db_name)
+        finally:
+            self.pool.put(self.conn)
+            self.conn = self.cursor = None
+            self.logger.debug("Returned connection to %s", self.db_name)
+        return False
+
+
 def setup_sample_database():
     """Create a sample database with some test data"""
     try:
@@ -95,6 +246,12 @@ def main():
         print(f"Unexpected error: {e}")
         raise
 
+    # Stream the same query in batches over a pooled connection
+    with PooledDatabaseConnection("users.db") as cursor:
+        cursor.execute("SELECT * FROM users")
+        for batch in cursor.iter_batches(2):
+            print(f"Batch of {len(batch)}: {batch}")
+
 
 if __name__ == "__main__":
     main()
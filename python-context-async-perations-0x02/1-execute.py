@@ -1,11 +1,63 @@
+import re
 import sqlite3
+from collections import namedtuple
+
+# sqlite's default limits on terms in a compound SELECT and on bound
+# variables per statement; rewritten queries are split to stay under them.
+MAX_UNION_TERMS = 500
+MAX_VARIABLES = 999
+
+_SELECT = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+_EQ_PARAM = re.compile(r"\s*([\w.]+)\s*=\s*\?\s*")
+_IN_QUERY = re.compile(
+    r"\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>\w+)"
+    r"(?:\s+(?:AS\s+)?(?!WHERE\b)(?P<alias>\w+))?"
+    r"\s+WHERE\s+(?P<where>.+?)(?P<order>\s+ORDER\s+BY\s+.+?)?\s*;?\s*",
+    re.IGNORECASE | re.DOTALL)
+_IN_UNSAFE = re.compile(
+    r"[(),]|\b(DISTINCT|GROUP|HAVING|OR|JOIN|LIMIT|UNION|INTERSECT|EXCEPT|"
+    r"WITH|OVER|BETWEEN|CASE)\b", re.IGNORECASE)
 
 
 class ExecuteQuery:
-    def __init__(self, query, params=None, db_name="users.db"):
+    """
+    Runs query on entry and returns its rows.
+
+    By default all rows are fetched before the with body runs. With
+    lazy=True an iterator is returned instead that pulls batch_size rows
+    at a time with fetchmany; the cursor stays open until exit, so the
+    rows must be consumed inside the with block.
+
+    row_type, if given, is called with each row's fields, e.g. a
+    namedtuple class; "namedtuple" builds one from the column names.
+
+    Given param_sets, a sequence of parameter tuples, the query is run
+    once per tuple over the same connection, so sqlite parses it once and
+    reuses the cached statement, and a list of results (rows, or the row
+    count for writes) is returned, one per tuple. For SELECTs, rewrite
+    collapses the runs into a single query: "union" joins one copy per
+    tuple with UNION ALL; "in" replaces the query's "column = ?" with a
+    join against a VALUES list of all the keys. "in" only accepts a
+    single-table SELECT ... WHERE whose conditions are ANDed and include
+    exactly one "column = ?", with no aggregates, subqueries, function
+    calls, OR, GROUP BY, HAVING, DISTINCT or LIMIT.
+    """
+
+    def __init__(self, query, params=None, db_name="users.db", lazy=False,
+                 batch_size=500, row_type=None, param_sets=None,
+                 rewrite=None):
+        if param_sets is not None and lazy:
+            raise ValueError("param_sets cannot be combined with lazy=True")
+        if rewrite is not None:
+            _check_rewrite(query, rewrite)
         self.query = query
         self.params = params if params is not None else ()
         self.db_name = db_name
+        self.lazy = lazy
+        self.batch_size = batch_size
+        self.row_type = row_type
+        self.param_sets = param_sets
+        self.rewrite = rewrite
         self.conn = None
         self.cursor = None
         self.result = None
@@ -16,14 +68,25 @@ class ExecuteQuery:
             self.conn = sqlite3.connect(self.db_name)
             self.cursor = self.conn.cursor()
 
+            if self.param_sets is not None:
+                self.result = self._run_param_sets(
+                    [tuple(params) for params in self.param_sets])
+                return self.result
+
             # Execute the query with parameters
             if self.params:
                 self.cursor.execute(self.query, self.params)
             else:
                 self.cursor.execute(self.query)
 
+            make_row = self._row_maker()
+            if self.lazy:
+                return self._iter_rows(make_row)
+
             # Fetch all results
             self.result = self.cursor.fetchall()
+            if make_row is not None:
+                self.result = [make_row(*row) for row in self.result]
             return self.result
 
         except sqlite3.Error as e:
@@ -32,6 +95,90 @@ class ExecuteQuery:
                 self.conn.rollback()
             raise
 
+    def _row_maker(self, skip=0):
+        """Row constructor for the current result, ignoring skip columns"""
+        if self.row_type == "namedtuple":
+            if self.cursor.description is None:
+                return None
+            columns = [column[0] for column in self.cursor.description]
+            return namedtuple("Row", columns[skip:], rename=True)
+        return self.row_type
+
+    def _run_param_sets(self, param_sets):
+        if not param_sets:
+            return []
+        if self.rewrite == "union":
+            return self._run_union(param_sets)
+        if self.rewrite == "in":
+            return self._run_in_list(param_sets)
+
+        results = []
+        make_row = None
+        for i, params in enumerate(param_sets):
+            self.cursor.execute(self.query, params)
+            if self.cursor.description is None:
+                results.append(self.cursor.rowcount)
+                continue
+            if i == 0:
+                make_row = self._row_maker()
+            rows = self.cursor.fetchall()
+            if make_row is not None:
+                rows = [make_row(*row) for row in rows]
+            results.append(rows)
+        return results
+
+    def _run_union(self, param_sets):
+        """One query per chunk: SELECT i, * FROM (query) UNION ALL ..."""
+        query = self.query.strip().rstrip(";")
+        per_set = max(1, len(param_sets[0]))
+        chunk = max(1, min(MAX_UNION_TERMS, MAX_VARIABLES // per_set))
+        results = [[] for _ in param_sets]
+        for start in range(0, len(param_sets), chunk):
+            sets = param_sets[start:start + chunk]
+            union = " UNION ALL ".join(
+                f"SELECT {start + i} AS _set, * FROM ({query})"
+                for i in range(len(sets)))
+            self.cursor.execute(union, [v for params in sets for v in params])
+            make_row = self._row_maker(skip=1)
+            for row in self.cursor:
+                results[row[0]].append(
+                    make_row(*row[1:]) if make_row else row[1:])
+        return results
+
+    def _run_in_list(self, param_sets):
+        """
+        One query per chunk, joining the table against the keys:
+        WITH _keys(_set, _key) AS (VALUES (0, ?), ...) SELECT _keys._set,
+        ... ON column = _keys._key. Rows are matched back to their set by
+        _set, so sqlite's own type coercion of the keys applies.
+        """
+        parts = _parse_in_query(self.query)
+        results = [[] for _ in param_sets]
+        for start in range(0, len(param_sets), MAX_VARIABLES):
+            sets = param_sets[start:start + MAX_VARIABLES]
+            keys = ", ".join(f"({start + i}, ?)" for i in range(len(sets)))
+            query = (f"WITH _keys(_set, _key) AS (VALUES {keys}) "
+                     f"SELECT _keys._set, {parts['columns']} FROM _keys "
+                     f"JOIN {parts['table']} ON {parts['column']} = _keys._key"
+                     f"{parts['where']}{parts['order']}")
+            self.cursor.execute(query, [params[0] for params in sets])
+            make_row = self._row_maker(skip=1)
+            for row in self.cursor:
+                results[row[0]].append(
+                    make_row(*row[1:]) if make_row else row[1:])
+        return results
+
+    def _iter_rows(self, make_row):
+        while True:
+            rows = self.cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            if make_row is None:
+                yield from rows
+            else:
+                for row in rows:
+                    yield make_row(*row)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Clean up resources"""
         if self.cursor:
@@ -47,6 +194,49 @@ class ExecuteQuery:
         return False
 
 
+def _check_rewrite(query, rewrite):
+    """Raises ValueError if query can't be rewritten in the given mode"""
+    if rewrite not in ("union", "in"):
+        raise ValueError(f"Unknown rewrite mode: {rewrite!r}")
+    if not _SELECT.match(query):
+        raise ValueError("Only SELECT queries can be rewritten")
+    if rewrite == "in":
+        _parse_in_query(query)
+
+
+def _parse_in_query(query):
+    """
+    Splits a query accepted by the "in" rewrite into the pieces the
+    rewritten query is built from; raises ValueError for anything else.
+    """
+    match = _IN_QUERY.fullmatch(query)
+    if match is None or query.count("?") != 1:
+        raise ValueError("IN-list rewrite needs a single-table "
+                         "SELECT ... WHERE with one 'column = ?'")
+    columns, where = match["columns"], match["where"]
+    if _IN_UNSAFE.search(where) or _IN_UNSAFE.search(match["order"] or "") \
+            or _IN_UNSAFE.search(columns.replace(",", " ")):
+        raise ValueError("IN-list rewrite does not support aggregates, "
+                         "subqueries, OR, GROUP BY, HAVING, DISTINCT or LIMIT")
+    conditions = re.split(r"\s+AND\s+", where, flags=re.IGNORECASE)
+    keyed = [c for c in conditions if _EQ_PARAM.fullmatch(c)]
+    if len(keyed) != 1:
+        raise ValueError("IN-list rewrite needs exactly one 'column = ?'")
+    rest = [c for c in conditions if c is not keyed[0]]
+    table = match["table"]
+    if match["alias"]:
+        table += f" AS {match['alias']}"
+    if columns.strip() == "*":
+        columns = f"{match['alias'] or match['table']}.*"
+    return {
+        "columns": columns,
+        "table": table,
+        "column": _EQ_PARAM.fullmatch(keyed[0]).group(1),
+        "where": f" WHERE {' AND '.join(rest)}" if rest else "",
+        "order": match["order"] or "",
+    }
+
+
 def setup_sample_database():
     """Create a sample database with users of different ages"""
     try:
@@ -115,6 +305,19 @@ def main():
     except Exception as e:
         print(f"Unexpected error: {e}")
 
+    # Stream the rows instead of loading them all up front
+    with ExecuteQuery(query, param, lazy=True, batch_size=2,
+                      row_type="namedtuple") as rows:
+        for user in rows:
+            print(f"{user.name} ({user.age})")
+
+    # One round trip for several thresholds instead of one each
+    thresholds = [(20,), (30,), (40,)]
+    with ExecuteQuery(query, param_sets=thresholds,
+                      rewrite="union") as results:
+        for (age,), rows in zip(thresholds, results):
+            print(f"Older than {age}: {len(rows)} users")
+
 
 if __name__ == "__main__":
     main()
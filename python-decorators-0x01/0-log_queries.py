@@ -1,22 +1,133 @@
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import random
 import sqlite3
+import logging
 import functools
-from datetime import datetime
+import threading
+import logging.handlers
 
-# Decorator to log SQL queries
+logger = logging.getLogger("queries")
 
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats query records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname}
+        entry.update(getattr(record, "query", {}))
+        return json.dumps(entry)
+
+
+def setup_query_logging(handler=None, level=logging.INFO):
+    """
+    Routes the "queries" logger through a QueueHandler, so the decorated
+    call only enqueues the record; a background QueueListener formats
+    and writes it (to stdout as JSON lines unless handler is given).
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    if handler is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(level)
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """Query text with literals replaced by ? and whitespace collapsed"""
+    return " ".join(_LITERALS.sub("?", query).split())
+
+
+def params_shape(params):
+    """Describes params without logging their values, e.g. 'tuple[2]'"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return "dict{" + ",".join(sorted(params)) + "}"
+    return f"{type(params).__name__}[{len(params)}]"
+
+
+def log_queries(func=None, *, sample_rate=1.0, slow_threshold=None):
+    """
+    Decorator that logs each query with its fingerprint, params shape,
+    duration, row count and thread.
+
+    Only a sample_rate fraction of calls is logged at INFO; calls slower
+    than slow_threshold seconds and failed calls are always logged, at
+    WARNING. Records go through the non-blocking handler installed by
+    setup_query_logging.
+    """
+    if func is None:
+        return functools.partial(log_queries, sample_rate=sample_rate,
+                                 slow_threshold=slow_threshold)
 
-def log_queries(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        if args:
-            arg = args[0]
-        else:
-            arg = kwargs.get("query")
-        print(f"[{datetime.now()}] Executing SQL query: {arg}")
-        return func(*args, **kwargs)
+        start = time.perf_counter()
+        result = error = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _log_call(args, kwargs, result, error,
+                      time.perf_counter() - start, sample_rate, slow_threshold)
     return wrapper
 
 
+def _log_call(args, kwargs, result, error, duration, sample_rate,
+              slow_threshold):
+    slow = slow_threshold is not None and duration >= slow_threshold
+    if error is None and not slow and \
+            (sample_rate < 1.0 and random.random() >= sample_rate):
+        return
+    level = logging.WARNING if slow or error is not None else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+
+    # The query is the first string argument, so that the decorator also
+    # works under with_db_connection, which passes the connection first.
+    strings = [(i, arg) for i, arg in enumerate(args) if isinstance(arg, str)]
+    if strings:
+        position, query = strings[0]
+        params = args[position + 1] if len(args) > position + 1 else None
+    else:
+        query = kwargs.get("query")
+        params = None
+    if params is None:
+        params = kwargs.get("params")
+    entry = {
+        "fingerprint": fingerprint(query) if isinstance(query, str)
+        else repr(query),
+        "params": params_shape(params),
+        "duration_ms": round(duration * 1000, 3),
+        "rows": len(result) if isinstance(result, list) else None,
+        "thread": threading.current_thread().name,
+        "slow": slow,
+    }
+    if error is not None:
+        entry["error"] = f"{type(error).__name__}: {error}"
+    logger.log(level, "query", extra={"query": entry})
+
+
 @log_queries
 def fetch_all_users(query):
     conn = sqlite3.connect('users.db')
@@ -27,5 +138,8 @@ def fetch_all_users(query):
     return results
 
 
-# fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
+if __name__ == "__main__":
+    setup_query_logging()
+
+    # fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
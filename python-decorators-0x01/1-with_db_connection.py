@@ -1,11 +1,203 @@
+import sys
+import time
 import sqlite3
 import functools
+import threading
 
+DB_NAME = "users.db"
+
+# Opt-in PRAGMAs for read-heavy workloads: write-ahead logging, fewer
+# fsyncs and memory-mapped reads (256 MiB).
+FAST_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,
+}
+
+_local = threading.local()
+
+
+def connect(db_name=DB_NAME, cached_statements=128, pragmas=None):
+    """Opens a connection with a statement cache and optional PRAGMAs"""
+    conn = sqlite3.connect(db_name, cached_statements=cached_statements)
+    for name, value in (pragmas or {}).items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def thread_connection(db_name=DB_NAME, cached_statements=128, pragmas=None):
+    """Returns this thread's persistent connection, opening it on first use"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (db_name, cached_statements, tuple(sorted((pragmas or {}).items())))
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = connect(db_name, cached_statements, pragmas)
+    return conn
+
+
+def close_thread_connections():
+    """Closes the persistent connections opened by the calling thread"""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of sqlite connections.
+
+    Connections are opened lazily up to size; further callers wait up to
+    timeout seconds. On checkout a connection is validated with a cheap
+    query and replaced if broken or older than max_lifetime seconds. On
+    return any transaction left open is rolled back.
+    """
+
+    def __init__(self, db_name=DB_NAME, size=5, timeout=30.0,
+                 max_lifetime=3600.0, cached_statements=128, pragmas=None):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.cached_statements = cached_statements
+        self.pragmas = pragmas
+        self._idle = []  # (connection, created_at), most recent last
+        self._open = 0
+        self._created_at = {}  # connection -> time it was opened
+        self._cond = threading.Condition()
+        self._stats = {"checkouts": 0, "creations": 0, "recycled": 0,
+                       "validation_failures": 0, "rollbacks": 0,
+                       "wait_time": 0.0, "max_wait_time": 0.0}
+
+    def get(self):
+        """Checks a connection out of the pool"""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"No connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+            waited = time.perf_counter() - start
+            self._stats["checkouts"] += 1
+            self._stats["wait_time"] += waited
+            self._stats["max_wait_time"] = max(
+                self._stats["max_wait_time"], waited)
+            if self._idle:
+                conn, created_at = self._idle.pop()
+            else:
+                conn, created_at = None, None
+                self._open += 1
+
+        if conn is not None:
+            reason = self._unusable(conn, created_at)
+            if reason:
+                self._close(conn)
+                with self._cond:
+                    self._stats[reason] += 1
+                conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def put(self, conn):
+        """Returns a connection to the pool, rolling back open transactions"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+                with self._cond:
+                    self._stats["rollbacks"] += 1
+        except sqlite3.Error:
+            self._close(conn)
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, self._created_at[conn]))
+            self._cond.notify()
+
+    def stats(self):
+        """Returns a snapshot of the pool's counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._open - len(self._idle)
+        return stats
+
+    def close(self):
+        """Closes all idle connections"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for name, value in (self.pragmas or {}).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._cond:
+            self._created_at[conn] = time.monotonic()
+            self._stats["creations"] += 1
+        return conn
+
+    def _close(self, conn):
+        with self._cond:
+            self._created_at.pop(conn, None)
+        conn.close()
+
+    def _unusable(self, conn, created_at):
+        """Returns the stats key explaining why conn can't be reused, if any"""
+        if time.monotonic() - created_at > self.max_lifetime:
+            return "recycled"
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return "validation_failures"
+        return None
+
+
+def with_db_connection(func=None, *, persistent=False, db_name=DB_NAME,
+                       cached_statements=128, pragmas=None, pool=None):
+    """
+    Decorator that passes a connection as the first argument, commits on
+    success and rolls back on error.
+
+    By default a new connection is opened and closed for every call. With
+    persistent=True each thread keeps one connection open and reuses it,
+    so sqlite's statement cache (cached_statements) survives between calls
+    and repeated queries are not re-parsed. pragmas (e.g. FAST_PRAGMAS) are
+    applied when a connection is opened. Given a ConnectionPool, the
+    connection is checked out of the pool and returned to it instead.
+
+    Usable both as @with_db_connection and @with_db_connection(...).
+    """
+    if func is None:
+        return functools.partial(
+            with_db_connection, persistent=persistent, db_name=db_name,
+            cached_statements=cached_statements, pragmas=pragmas, pool=pool)
 
-def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
+        if pool is not None:
+            conn = pool.get()
+        elif persistent:
+            conn = thread_connection(db_name, cached_statements, pragmas)
+        else:
+            conn = connect(db_name, cached_statements, pragmas)
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
@@ -14,10 +206,32 @@ def with_db_connection(func):
             conn.rollback()
             raise e
         finally:
-            conn.close()
+            if pool is not None:
+                pool.put(conn)
+            elif not persistent:
+                conn.close()
     return wrapper
 
 
+def bulk_execute(conn, query, rows, batch_size=1000):
+    """
+    Runs query once per parameter tuple in rows with executemany, in
+    batches of batch_size inside a single transaction. Returns the
+    number of rows affected.
+    """
+    total = 0
+    batch = []
+    with conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                total += conn.executemany(query, batch).rowcount
+                batch = []
+        if batch:
+            total += conn.executemany(query, batch).rowcount
+    return total
+
+
 @with_db_connection
 def get_user_by_id(conn, user_id):
     cursor = conn.cursor()
@@ -25,6 +239,31 @@ def get_user_by_id(conn, user_id):
     return cursor.fetchone()
 
 
-# Fetch user by ID with automatic connection handling
-user = get_user_by_id(user_id=1)
-print(user)
+def benchmark_get_user_by_id(calls=10000):
+    """Prints calls/sec for get_user_by_id per connection strategy"""
+    lookup = get_user_by_id.__wrapped__
+    pool = ConnectionPool()
+    variants = [
+        ("connection per call", get_user_by_id),
+        ("persistent", with_db_connection(persistent=True)(lookup)),
+        ("persistent + pragmas",
+         with_db_connection(persistent=True, pragmas=FAST_PRAGMAS)(lookup)),
+        ("pooled", with_db_connection(pool=pool)(lookup)),
+    ]
+    for label, fetch in variants:
+        start = time.perf_counter()
+        for i in range(calls):
+            fetch(user_id=i % 100 + 1)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>22}: {calls / elapsed:,.0f} calls/sec")
+    close_thread_connections()
+    pool.close()
+
+
+if __name__ == "__main__":
+    # Fetch user by ID with automatic connection handling
+    user = get_user_by_id(user_id=1)
+    print(user)
+
+    if "--benchmark" in sys.argv:
+        benchmark_get_user_by_id()
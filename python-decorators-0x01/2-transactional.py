@@ -1,5 +1,8 @@
+import sys
+import time
 import sqlite3
 import functools
+import threading
 
 
 def with_db_connection(func):
@@ -19,8 +22,141 @@ def with_db_connection(func):
     return wrapper
 
 
-def transactional(func):
-    """Decorator that ensures database operations are wrapped in a transaction"""
+class _Batch:
+    """Writes waiting to be committed together"""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.size = 0
+        self.done = False
+        self.error = None
+
+
+class GroupCommitter:
+    """
+    Merges transactional calls from many threads on one shared connection
+    into a single commit.
+
+    The first call opens a transaction; each call then runs inside its own
+    SAVEPOINT, so a failing call is rolled back alone and gets its own
+    exception. The transaction is committed as soon as no other call is
+    waiting to join it, once max_batch calls have joined, or `window`
+    seconds after it was opened, whichever comes first. Every caller
+    returns only after that commit; if it fails, they all get the error.
+    The same happens if the transaction breaks mid-batch, e.g. when sqlite
+    rolls it back on a full disk or I/O error and a savepoint is lost.
+    """
+
+    def __init__(self, conn, window=0.005, max_batch=64):
+        conn.isolation_level = None  # transactions are managed here
+        self.conn = conn
+        self.window = window
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._batch = None
+        self._savepoints = 0
+        self._arriving = 0
+        self._arriving_lock = threading.Lock()
+        self.stats = {"commits": 0, "calls": 0, "failed_calls": 0}
+
+    def run(self, func, *args, **kwargs):
+        """Runs func(conn, *args, **kwargs) as part of the current batch"""
+        with self._arriving_lock:
+            self._arriving += 1
+        with self._cond:
+            with self._arriving_lock:
+                self._arriving -= 1
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                self.conn.execute("BEGIN")
+                batch = self._batch = _Batch(time.monotonic() + self.window)
+
+            error = None
+            try:
+                self._savepoints += 1
+                savepoint = f"gc_{self._savepoints}"
+                self.conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    result = func(self.conn, *args, **kwargs)
+                    self.conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+                    batch.size += 1
+                    self.stats["calls"] += 1
+                except Exception as e:
+                    self.stats["failed_calls"] += 1
+                    error = e
+                    self.conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    self.conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except BaseException as e:
+                # The transaction itself is broken (e.g. sqlite already
+                # rolled it back): the whole batch is lost.
+                self._abort(batch, e)
+                raise
+
+            if batch.size >= self.max_batch:
+                self._commit(batch)
+            else:
+                self._cond.notify_all()  # let the leader re-check
+            while not batch.done:
+                # Followers only commit if the leader has not by the
+                # deadline, so nobody waits on a leader that never returns.
+                remaining = batch.deadline - time.monotonic()
+                if remaining <= 0 or (leader and not self._arriving):
+                    self._commit(batch)
+                    break
+                self._cond.wait(remaining)
+
+        if error is not None:
+            raise error
+        if batch.error is not None:
+            raise batch.error
+        return result
+
+    def _commit(self, batch):
+        """Commits the open transaction; the condition's lock is held"""
+        try:
+            self.conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._abort(batch, e)
+        else:
+            self.stats["commits"] += 1
+            self._finish(batch)
+
+    def _abort(self, batch, error):
+        """Rolls back the open transaction and fails every call in batch"""
+        batch.error = error
+        try:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+        finally:
+            self._finish(batch)
+
+    def _finish(self, batch):
+        batch.done = True
+        if self._batch is batch:
+            self._batch = None
+        self._cond.notify_all()
+
+
+def transactional(func=None, *, group_commit=None):
+    """
+    Decorator that ensures database operations are wrapped in a transaction
+
+    With group_commit, a GroupCommitter, the decorated function is called
+    without a connection argument: it runs on the committer's shared
+    connection and its commit is merged with concurrent calls.
+    """
+    if func is None:
+        return functools.partial(transactional, group_commit=group_commit)
+
+    if group_commit is not None:
+        @functools.wraps(func)
+        def grouped(*args, **kwargs):
+            return group_commit.run(func, *args, **kwargs)
+        return grouped
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
         # Check if we're already in a transaction (nested transactions)
@@ -66,5 +202,53 @@ def update_user_email(conn, user_id, new_email):
                    (new_email, user_id))
 
 
-# Update user's email with automatic transaction handling
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+def benchmark_group_commit(threads=8, writes=250):
+    """Compares writes/sec with a commit per call against group commit"""
+    setup = sqlite3.connect('users.db')
+    setup.execute("PRAGMA journal_mode = WAL")
+    setup.close()
+    write = update_user_email.__wrapped__.__wrapped__
+
+    def per_call():
+        local = threading.local()
+
+        def update(user_id, new_email):
+            if not hasattr(local, "conn"):
+                local.conn = sqlite3.connect('users.db', timeout=30)
+                local.conn.execute("PRAGMA synchronous = FULL")
+            write(local.conn, user_id, new_email)
+            local.conn.commit()
+        return update
+
+    def grouped():
+        conn = sqlite3.connect('users.db', timeout=30,
+                               check_same_thread=False)
+        conn.execute("PRAGMA synchronous = FULL")
+        return transactional(group_commit=GroupCommitter(conn))(write)
+
+    for label, make in (("commit per call", per_call),
+                        ("group commit", grouped)):
+        update = make()
+
+        def worker(offset):
+            for i in range(writes):
+                update(user_id=(offset + i) % 100 + 1,
+                       new_email=f"user{i}@example.com")
+
+        workers = [threading.Thread(target=worker, args=(n * writes,))
+                   for n in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>16}: {threads * writes / elapsed:,.0f} writes/sec")
+
+
+if __name__ == "__main__":
+    # Update user's email with automatic transaction handling
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+
+    if "--benchmark" in sys.argv:
+        benchmark_group_commit()
@@ -1,6 +1,9 @@
 import time
+import random
+import asyncio
 import sqlite3
 import functools
+import threading
 
 
 def with_db_connection(func):
@@ -19,25 +22,140 @@ def with_db_connection(func):
     return wrapper
 
 
-def retry_on_failure(retries=3, delay=2):
-    """Decorator that retries the function if it raises an exception"""
+# sqlite3.OperationalError messages that describe a passing condition
+# rather than a bug in the query
+TRANSIENT_ERRORS = (
+    "database is locked",
+    "database table is locked",
+    "database schema has changed",
+    "disk i/o error",
+    "unable to open database file",
+)
+
+
+def is_transient(error):
+    """Returns True for errors worth retrying, such as a locked database"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return any(text in message for text in TRANSIENT_ERRORS)
+
+
+class RetryMetrics:
+    """Thread-safe counters and latency totals for retried calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.successes = 0
+        self.failures = 0
+        self.budget_exhausted = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, attempts, latency, succeeded, out_of_budget=False):
+        with self._lock:
+            self.calls += 1
+            self.attempts += attempts
+            self.retries += attempts - 1
+            if succeeded:
+                self.successes += 1
+            else:
+                self.failures += 1
+            if out_of_budget:
+                self.budget_exhausted += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(vars(self))
+        del stats["_lock"]
+        stats["mean_latency"] = (
+            self.total_latency / self.calls if self.calls else 0.0)
+        return stats
+
+
+retry_metrics = RetryMetrics()
+
+
+def backoff_delay(attempt, delay, max_delay):
+    """Full-jitter exponential backoff: uniform in [0, delay * 2**attempt]"""
+    return random.uniform(0, min(max_delay, delay * 2 ** attempt))
+
+
+def retry_on_failure(retries=3, delay=2, max_delay=30.0, budget=None,
+                     retry_if=is_transient, metrics=retry_metrics):
+    """
+    Decorator that retries the function if it raises a transient error.
+
+    The wait before retry n is drawn uniformly from
+    [0, min(max_delay, delay * 2**n)] so that workers failing together do
+    not retry in lockstep. Only errors for which retry_if(error) is true
+    are retried (by default a locked or unavailable database); anything
+    else is raised at once. With a budget, no retry is started that would
+    end more than budget seconds after the first attempt began.
+    Coroutine functions get an async wrapper that sleeps with asyncio.
+    """
     def decorator(func):
+        def next_delay(attempt, error, start):
+            """Seconds to wait before the next attempt, or None to give up"""
+            if not retry_if(error) or attempt >= retries - 1:
+                return None
+            wait = backoff_delay(attempt, delay, max_delay)
+            if budget is not None and \
+                    time.monotonic() - start + wait > budget:
+                return None
+            return wait
+
+        def give_up(attempt, error, start):
+            out_of_budget = retry_if(error) and attempt < retries - 1
+            metrics.record(attempt + 1, time.monotonic() - start, False,
+                           out_of_budget)
+            print(f"Giving up after {attempt + 1} attempt(s). "
+                  f"Last error: {error}")
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.monotonic()
+                for attempt in range(retries):
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        wait = next_delay(attempt, e, start)
+                        if wait is None:
+                            give_up(attempt, e, start)
+                            raise
+                        print(f"Attempt {attempt + 1} failed: {e}. "
+                              f"Retrying in {wait:.2f} seconds...")
+                        await asyncio.sleep(wait)
+                    else:
+                        metrics.record(attempt + 1,
+                                       time.monotonic() - start, True)
+                        return result
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            start = time.monotonic()
             for attempt in range(retries):
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    if attempt < retries - 1:
-                        print(
-                            f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-                        time.sleep(delay)
-                    else:
-                        print(
-                            f"All {retries} attempts failed. Last error: {e}")
-            raise last_exception
+                    wait = next_delay(attempt, e, start)
+                    if wait is None:
+                        give_up(attempt, e, start)
+                        raise
+                    print(f"Attempt {attempt + 1} failed: {e}. "
+                          f"Retrying in {wait:.2f} seconds...")
+                    time.sleep(wait)
+                else:
+                    metrics.record(attempt + 1, time.monotonic() - start,
+                                   True)
+                    return result
         return wrapper
     return decorator
 
@@ -50,6 +168,8 @@ def fetch_users_with_retry(conn):
     return cursor.fetchall()
 
 
-# Attempt to fetch users with automatic retry on failure
-users = fetch_users_with_retry()
-print(users)
+if __name__ == "__main__":
+    # Attempt to fetch users with automatic retry on failure
+    users = fetch_users_with_retry()
+    print(users)
+    print(f"Retry metrics: {retry_metrics.snapshot()}")
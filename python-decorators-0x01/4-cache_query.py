@@ -1,23 +1,520 @@
+import os
+import re
+import sys
+import time
+import pickle
+import hashlib
+import logging
 import sqlite3
 import functools
+import threading
+from collections import OrderedDict
 
-query_cache = {}
+logger = logging.getLogger("query_cache")
 
+# Lookup states returned by QueryCache.begin
+FRESH, STALE, LEADER, FOLLOWER = "fresh", "stale", "leader", "follower"
 
-def cache_query(func):
-    """Decorator that caches query results based on the SQL query string."""
+
+class _Flight:
+    """One in-flight execution of a query, shared by concurrent callers"""
+
+    __slots__ = ("done", "result", "error", "generations")
+
+    def __init__(self, generations=()):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.generations = generations  # (table, generation) at start
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class PersistentCache:
+    """
+    Disk tier for QueryCache, stored in its own sqlite file so cached
+    results survive restarts.
+
+    Each result is pickled under a hash of its cache key together with a
+    version token of the source database: the modification time and size
+    of the database file and its WAL, plus the file change counter from
+    the database header and the WAL header's checkpoint sequence and
+    salts. Any committed write changes the token, even two same-size
+    commits within one timestamp tick, so results cached before it are
+    never served afterwards.
+    """
+
+    def __init__(self, path="query_cache.db", source_db="users.db"):
+        self.path = path
+        self.source_db = source_db
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key_hash TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                expires REAL NOT NULL,
+                tables TEXT NOT NULL,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def version(self):
+        """Current version token of the source database"""
+        parts = []
+        # (suffix, header bytes that change on commit): the database's
+        # file change counter, and the WAL's checkpoint sequence and salts
+        for suffix, start, end in (("", 24, 28), ("-wal", 12, 24)):
+            try:
+                with open(self.source_db + suffix, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    header = f.read(end)[start:end]
+            except FileNotFoundError:
+                continue
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}:{header.hex()}")
+        return "|".join(parts)
+
+    def load(self, key, version):
+        """Returns (True, result) if a live entry matches version"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, expires, payload FROM results "
+                "WHERE key_hash = ?", (_key_hash(key),)).fetchone()
+        if row is None or row[0] != version or row[1] <= time.time():
+            return False, None
+        return True, pickle.loads(row[2])
+
+    def store(self, key, result, version, tables, ttl):
+        """Saves result for key as of the given version token"""
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        tagged = "".join(f",{table}," for table in sorted(tables))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (_key_hash(key), version, time.time() + ttl, tagged, payload))
+
+    def invalidate_tables(self, tables):
+        """Deletes stored results that read any of tables"""
+        with self._lock, self._conn:
+            for table in tables:
+                self._conn.execute(
+                    "DELETE FROM results WHERE tables LIKE ?",
+                    (f"%,{table},%",))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results")
+
+    def close(self):
+        self._conn.close()
+
+
+def _key_hash(key):
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results.
+
+    Entries are keyed by normalized query text plus parameters, expire
+    after ttl seconds, and are evicted least-recently-used first once the
+    cache holds more than max_entries results or max_bytes (estimated).
+    Each entry remembers the tables its query reads, so writes to a table
+    can invalidate exactly the results that depend on it.
+
+    Misses are single-flight: while one caller executes a query, others
+    asking for the same key wait for its result instead of running it
+    again (see begin and finish).
+
+    Every invalidation bumps a generation counter for its tables and
+    detaches flights reading them. A flight that started before a write
+    is finished for its callers but not cached, so a result read before
+    the write committed cannot outlive the invalidation.
+
+    An optional PersistentCache is consulted on in-memory misses before
+    the query runs, and every executed result is written through to it.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024,
+                 ttl=300.0, persistent=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persistent = persistent
+        self._entries = OrderedDict()  # key -> (result, size, expires, tables)
+        self._by_table = {}  # table -> set of keys
+        self._inflight = {}  # key -> _Flight
+        self._generations = {}  # table -> number of invalidations
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0,
+                      "expirations": 0, "invalidations": 0,
+                      "stale_hits": 0, "coalesced": 0, "refreshes": 0,
+                      "disk_hits": 0, "disk_errors": 0}
+
+    def get(self, key):
+        """Returns (True, result) on a fresh hit, else (False, None)"""
+        with self._lock:
+            result = self._lookup(key)
+            if result is None:
+                self.stats["misses"] += 1
+                return False, None
+            self.stats["hits"] += 1
+            return True, result[1]
+
+    def peek(self, key):
+        """
+        Returns (True, result) for any entry still held, expired or not,
+        without touching counters or LRU order; for fallbacks that prefer
+        an old result to none.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            return True, entry[0]
+
+    def begin(self, key, stale_ttl=0.0, tables=()):
+        """
+        Looks key up and, on a miss, joins or starts its execution of a
+        query reading tables.
+
+        Returns (FRESH, result), or (STALE, result) for an entry expired
+        less than stale_ttl seconds ago. On a miss returns (LEADER, flight)
+        to the first caller, who must run the query and call finish, and
+        (FOLLOWER, flight) to everyone else, who can flight.wait().
+        """
+        with self._lock:
+            found = self._lookup(key, stale_ttl)
+            if found is not None:
+                state, result = found
+                self.stats["hits" if state == FRESH else "stale_hits"] += 1
+                return state, result
+            self.stats["misses"] += 1
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                return FOLLOWER, flight
+            flight = self._inflight[key] = self._new_flight(tables)
+            return LEADER, flight
+
+    def claim_refresh(self, key, tables=()):
+        """Returns a new flight to refresh a stale key, or None if one runs"""
+        with self._lock:
+            if key in self._inflight:
+                return None
+            self.stats["refreshes"] += 1
+            flight = self._inflight[key] = self._new_flight(tables)
+            return flight
+
+    def source_version(self):
+        """Version token to pass to load and finish, or None"""
+        if self.persistent is None:
+            return None
+        return self.persistent.version()
+
+    def load(self, key, version):
+        """
+        Looks key up in the persistent tier, returning (found, result).
+        A failed read (e.g. a locked cache file or a payload that no
+        longer unpickles) is logged and treated as a miss; the result of
+        re-running the query then replaces the bad entry.
+        """
+        if self.persistent is None:
+            return False, None
+        try:
+            found, result = self.persistent.load(key, version)
+        except Exception:
+            with self._lock:
+                self.stats["disk_errors"] += 1
+            logger.warning("Ignoring disk cache entry for %r", key[0],
+                           exc_info=True)
+            return False, None
+        if found:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+        return found, result
+
+    def finish(self, key, flight, result=None, error=None, tables=(),
+               ttl=None, version=None):
+        """
+        Completes a flight, caching result unless error is set. A result
+        computed against source version `version` is also written to the
+        persistent tier; failing to write it there (e.g. an unpicklable
+        result or a locked cache file) is logged and otherwise ignored.
+        """
+        try:
+            if error is None:
+                # Checked and cached under one lock, so an invalidation
+                # can't slip in between and be missed.
+                with self._lock:
+                    current = self._current(flight)
+                    if current:
+                        self.set(key, result, tables, ttl)
+                if current and self.persistent is not None and \
+                        version is not None:
+                    self._store(key, result, version, tables, ttl)
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.result, flight.error = result, error
+            flight.done.set()
+
+    def _new_flight(self, tables):
+        return _Flight(tuple((table, self._generations.get(table, 0))
+                             for table in tables))
+
+    def _current(self, flight):
+        """True if no table the flight reads was invalidated since it began"""
+        with self._lock:
+            return all(self._generations.get(table, 0) == generation
+                       for table, generation in flight.generations)
+
+    def _store(self, key, result, version, tables, ttl):
+        try:
+            self.persistent.store(key, result, version, tables,
+                                  self.ttl if ttl is None else ttl)
+        except Exception:
+            with self._lock:
+                self.stats["disk_errors"] += 1
+            logger.warning("Not caching %r on disk", key[0], exc_info=True)
+
+    def set(self, key, result, tables=(), ttl=None):
+        """Stores result under key, evicting older entries if needed"""
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, expires, frozenset(tables))
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while (len(self._entries) > self.max_entries or
+                   self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate_tables(self, tables):
+        """Drops every cached result that reads any of tables"""
+        if self.persistent is not None:
+            self.persistent.invalidate_tables(tables)
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in self._by_table.pop(table, set()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.stats["invalidations"] += 1
+            # Later callers start a new flight instead of joining one
+            # that may have read the old rows.
+            for key, flight in list(self._inflight.items()):
+                if any(table in tables for table, _ in flight.generations):
+                    del self._inflight[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key, stale_ttl=0.0):
+        """Returns (FRESH|STALE, result) or None, dropping dead entries"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expired_for = time.monotonic() - entry[2]
+        if expired_for >= stale_ttl and expired_for >= 0:
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return (FRESH if expired_for < 0 else STALE), entry[0]
+
+    def _remove(self, key):
+        _, size, _, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+
+query_cache = QueryCache()
+
+_TABLE_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+[\"`\[]?(\w+)", re.IGNORECASE)
+# The rest of a FROM clause, for comma joins such as "FROM a, b"
+_FROM_LIST = re.compile(
+    r"\bFROM\s+(.+?)(?=\s+(?:WHERE|GROUP|ORDER|LIMIT|HAVING|UNION|EXCEPT|"
+    r"INTERSECT|WINDOW|NATURAL|LEFT|RIGHT|FULL|INNER|CROSS|JOIN|ON|USING)\b"
+    r"|[();]|$)", re.IGNORECASE | re.DOTALL)
+_TABLE_NAME = re.compile(r"\s*[\"`\[]?(\w+)")
+# A quoted string or identifier, or a run of whitespace outside of one
+_QUOTED_OR_SPACE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+")
+
+
+def normalize_query(query):
+    """
+    Collapses whitespace outside quoted literals and drops a trailing
+    semicolon; literals are kept as written, since 'a  b' and 'a b' are
+    different values.
+    """
+    collapsed = _QUOTED_OR_SPACE.sub(
+        lambda m: " " if m.group().isspace() else m.group(), query)
+    return collapsed.strip().rstrip(";").strip()
+
+
+def referenced_tables(query):
+    """Returns the lower-cased names of the tables a query touches"""
+    names = _TABLE_PATTERN.findall(query)
+    for clause in _FROM_LIST.findall(query):
+        for item in clause.split(",")[1:]:
+            match = _TABLE_NAME.match(item)
+            if match:
+                names.append(match.group(1))
+    return frozenset(name.lower() for name in names)
+
+
+def make_key(query, params=()):
+    """Cache key from the normalized query and its parameters"""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    return normalize_query(query), tuple(params)
+
+
+def _result_size(result):
+    """Rough in-memory size of a list of rows, in bytes"""
+    size = sys.getsizeof(result)
+    if isinstance(result, (list, tuple)):
+        for row in result:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+def _flight_error(error):
+    """
+    The error handed to a flight's waiters: Exceptions as they are, but
+    an interrupt (KeyboardInterrupt, SystemExit) of the thread running
+    the query is reported to the others as a RuntimeError instead.
+    """
+    if isinstance(error, Exception):
+        return error
+    return RuntimeError(f"Query was interrupted: {error!r}")
+
+
+def cache_query(func=None, *, ttl=None, cache=query_cache, stale_ttl=0.0,
+                connect=None):
+    """
+    Decorator that caches query results by query text and parameters.
+
+    The decorated function is called as func(conn, query, params=()).
+    Results expire after ttl seconds (the cache's default if None) and
+    are dropped when a function decorated with invalidates_cache writes
+    to one of the tables the query reads. Concurrent identical misses
+    run the query once and share its result.
+
+    With stale_ttl > 0, a result expired less than stale_ttl seconds ago
+    is still returned while a single background thread refreshes it on a
+    connection from connect(), since the caller's own connection may be
+    closed by then.
+    """
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl, cache=cache,
+                                 stale_ttl=stale_ttl, connect=connect)
+    if stale_ttl and connect is None:
+        raise ValueError("stale_ttl requires a connect callable")
+
+    def refresh(key, flight, tables, query, args, kwargs):
+        # Every path must finish the flight: an abandoned one would make
+        # later callers of the key wait on it forever.
+        try:
+            version = cache.source_version()
+            conn = connect()
+            try:
+                result = func(conn, query, *args, **kwargs)
+            finally:
+                conn.close()
+        except BaseException as e:
+            cache.finish(key, flight, error=_flight_error(e))
+            return
+        cache.finish(key, flight, result, tables=tables, ttl=ttl,
+                     version=version)
 
     @functools.wraps(func)
     def wrapper(conn, query, *args, **kwargs):
-        # If query is already cached, return cached result
-        if query in query_cache:
-            print(f"[CACHE HIT] Returning cached result for: {query}")
-            return query_cache[query]
-
-        # Otherwise, execute the function and store result
-        print(f"[CACHE MISS] Executing and caching result for: {query}")
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
+        params = args[0] if args else kwargs.get("params", ())
+        key = make_key(query, params)
+        tables = referenced_tables(query)
+        state, value = cache.begin(key, stale_ttl, tables)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            flight = cache.claim_refresh(key, tables)
+            if flight is not None:
+                try:
+                    threading.Thread(
+                        target=refresh, daemon=True,
+                        args=(key, flight, tables, query, args,
+                              kwargs)).start()
+                except BaseException as e:
+                    cache.finish(key, flight, error=_flight_error(e))
+                    raise
+            return value
+        if state == FOLLOWER:
+            return value.wait()
+
+        # The version is read before querying, so a write that lands
+        # meanwhile leaves this result tagged with the older version.
+        try:
+            version = cache.source_version()
+            found, result = cache.load(key, version)
+            if not found:
+                result = func(conn, query, *args, **kwargs)
+        except BaseException as e:
+            cache.finish(key, value, error=_flight_error(e))
+            raise
+        cache.finish(key, value, result, tables=tables, ttl=ttl,
+                     version=None if found else version)
+        return result
+    return wrapper
+
+
+def invalidates_cache(func=None, *, cache=query_cache):
+    """
+    Decorator for write functions taking the query as their first string
+    argument (or query=): once the write succeeds, cached results reading
+    the tables it touched are invalidated. Apply it outside
+    with_db_connection, so that this happens after the commit; otherwise
+    a concurrent reader could cache the rows from before it.
+    """
+    if func is None:
+        return functools.partial(invalidates_cache, cache=cache)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        query = next((arg for arg in args if isinstance(arg, str)),
+                     kwargs.get("query"))
+        cache.invalidate_tables(referenced_tables(query))
         return result
     return wrapper
 
@@ -28,7 +525,9 @@ def with_db_connection(func):
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect("users.db")
         try:
-            return func(conn, *args, **kwargs)
+            result = func(conn, *args, **kwargs)
+            conn.commit()
+            return result
         finally:
             conn.close()
     return wrapper
@@ -36,16 +535,30 @@ def with_db_connection(func):
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 
-# First call will cache the result
-users = fetch_users_with_cache(query="SELECT * FROM users")
-print(users)
+@invalidates_cache
+@with_db_connection
+def execute_write(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.rowcount
+
+
+if __name__ == "__main__":
+    if "--persistent" in sys.argv:
+        query_cache.persistent = PersistentCache()
+
+    # First call will cache the result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
+    print(users)
+
+    # Second call will use the cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    print(users_again)
 
-# Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
-print(users_again)
+    print(f"Cache stats: {query_cache.stats}")
@@ -0,0 +1,184 @@
+import time
+import sqlite3
+import functools
+import threading
+from collections import deque
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+retry_on_failure = __import__('3-retry_on_failure').retry_on_failure
+cache_module = __import__('4-cache_query')
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the breaker is open"""
+
+
+def is_database_failure(error):
+    """Errors that count against the breaker: the database, not the query"""
+    return isinstance(error, sqlite3.OperationalError)
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `window` calls and opens once at
+    least `min_calls` have been seen and the share of failures reaches
+    failure_rate. While open, calls fail fast. After `cooldown` seconds
+    the breaker goes half-open and lets `half_open_calls` trial calls
+    through: a success closes it, a failure opens it again.
+
+    Every state change is passed to the listeners as
+    listener(breaker, old_state, new_state).
+    """
+
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=5,
+                 cooldown=30.0, half_open_calls=1,
+                 failure_if=is_database_failure, listeners=()):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self.failure_if = failure_if
+        self.listeners = list(listeners)
+        self._outcomes = deque(maxlen=window)  # True for a failure
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            changes = self._expire_cooldown()
+            state = self._state
+        self._notify(changes)
+        return state
+
+    def allow(self):
+        """Returns True if a call may go through now"""
+        with self._lock:
+            changes = self._expire_cooldown()
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and \
+                    self._trials < self.half_open_calls:
+                self._trials += 1
+                allowed = True
+            else:
+                allowed = False
+        self._notify(changes)
+        return allowed
+
+    def record_success(self):
+        with self._lock:
+            changes = []
+            if self._state == HALF_OPEN:
+                self._outcomes.clear()
+                changes.append(self._set_state(CLOSED))
+            else:
+                self._outcomes.append(False)
+        self._notify(changes)
+
+    def record_failure(self):
+        with self._lock:
+            changes = []
+            if self._state == HALF_OPEN:
+                changes.append(self._open())
+            else:
+                self._outcomes.append(True)
+                calls = len(self._outcomes)
+                if self._state == CLOSED and calls >= self.min_calls and \
+                        sum(self._outcomes) / calls >= self.failure_rate:
+                    changes.append(self._open())
+        self._notify(changes)
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        return self._set_state(OPEN)
+
+    def _expire_cooldown(self):
+        if self._state == OPEN and \
+                time.monotonic() - self._opened_at >= self.cooldown:
+            self._trials = 0
+            return [self._set_state(HALF_OPEN)]
+        return []
+
+    def _set_state(self, state):
+        old, self._state = self._state, state
+        return old, state
+
+    def _notify(self, changes):
+        for old, new in changes:
+            for listener in self.listeners:
+                listener(self, old, new)
+
+
+def log_transition(breaker, old, new):
+    """Listener that prints every state change"""
+    print(f"[circuit {breaker.name}] {old} -> {new}")
+
+
+def circuit_breaker(breaker, fallback=None):
+    """
+    Decorator that routes calls through breaker.
+
+    While the breaker is open the call is not made; fallback(*args,
+    **kwargs) is returned instead if given, else CircuitOpenError is
+    raised. Apply it outside with_db_connection so that no connection is
+    opened while failing fast, and outside retry_on_failure so that a
+    call that exhausted its retries counts as one failure.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not breaker.allow():
+                if fallback is not None:
+                    return fallback(*args, **kwargs)
+                raise CircuitOpenError(f"Circuit {breaker.name} is open")
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if breaker.failure_if(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            breaker.record_success()
+            return result
+        return wrapper
+    return decorator
+
+
+def cached_fallback(cache=cache_module.query_cache):
+    """
+    Fallback for functions called as func(query, params=()) that returns
+    the last cached result of the query, even if expired, or raises
+    CircuitOpenError when nothing is cached.
+    """
+    def fallback(query, params=()):
+        found, result = cache.peek(cache_module.make_key(query, params))
+        if not found:
+            raise CircuitOpenError("Circuit is open and no result is cached")
+        return result
+    return fallback
+
+
+users_breaker = CircuitBreaker("users.db", listeners=[log_transition])
+
+
+@circuit_breaker(users_breaker, fallback=cached_fallback())
+@with_db_connection
+@retry_on_failure(retries=3, delay=0.1)
+@cache_module.cache_query
+def fetch_users(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    users = fetch_users(query="SELECT * FROM users")
+    print(users)
+    print(f"Circuit state: {users_breaker.state}")
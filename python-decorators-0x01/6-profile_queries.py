@@ -0,0 +1,148 @@
+import sys
+import math
+import time
+import atexit
+import sqlite3
+import functools
+import threading
+
+log_queries_module = __import__('0-log_queries')
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+# Latencies are bucketed on a log scale: bucket n holds durations up to
+# _BASE ** n microseconds, so percentiles are accurate to within 10%.
+_BASE = 1.1
+
+
+class _QueryStats:
+    """Latency histogram and query plan for one query fingerprint"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.buckets = {}
+        self.plan = None
+        self.full_scan = False
+
+    def add(self, duration):
+        self.calls += 1
+        self.total += duration
+        bucket = max(0, math.ceil(math.log(max(duration * 1e6, 1), _BASE)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, in seconds"""
+        rank = q * self.calls
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return _BASE ** bucket / 1e6
+        return 0.0
+
+
+class QueryProfiler:
+    """
+    Collects per-fingerprint latency histograms and, the first time each
+    fingerprint is seen, its EXPLAIN QUERY PLAN, flagging plans that scan
+    a whole table without an index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, conn, query, params, duration):
+        key = log_queries_module.fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _QueryStats()
+            stats.add(duration)
+            needs_plan = stats.plan is None
+            if needs_plan:
+                stats.plan = []
+        if needs_plan:
+            plan = explain(conn, query, params)
+            with self._lock:
+                stats.plan = plan
+                stats.full_scan = any(is_full_scan(step) for step in plan)
+
+    def report(self, top=10):
+        """Returns the top fingerprints by total time as text"""
+        with self._lock:
+            ranked = sorted(self._stats.items(),
+                            key=lambda item: item[1].total, reverse=True)
+        lines = [f"{'total ms':>10} {'calls':>7} {'p50 ms':>8} "
+                 f"{'p95 ms':>8} {'p99 ms':>8}  query"]
+        for key, stats in ranked[:top]:
+            p50, p95, p99 = (stats.percentile(q) * 1000
+                             for q in (0.5, 0.95, 0.99))
+            flag = "  [FULL SCAN]" if stats.full_scan else ""
+            lines.append(f"{stats.total * 1000:>10.2f} {stats.calls:>7} "
+                         f"{p50:>8.3f} {p95:>8.3f} {p99:>8.3f}  {key}{flag}")
+            for step in stats.plan or ():
+                lines.append(f"{'':>47}  - {step}")
+        return "\n".join(lines)
+
+    def dump_at_exit(self, stream=sys.stderr, top=10):
+        """Prints the report when the interpreter exits"""
+        atexit.register(lambda: print(self.report(top), file=stream))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def explain(conn, query, params=()):
+    """Returns the EXPLAIN QUERY PLAN detail lines for query"""
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(step):
+    """True for plan steps that read a whole table without an index"""
+    return step.startswith("SCAN") and "USING" not in step
+
+
+profiler = QueryProfiler()
+
+
+def profile_queries(func=None, *, profiler=profiler):
+    """
+    Decorator for functions called as func(conn, query, params=()) that
+    records their latency and query plan in profiler. Apply it inside
+    with_db_connection, which supplies conn, and log_queries outside.
+    """
+    if func is None:
+        return functools.partial(profile_queries, profiler=profiler)
+
+    @functools.wraps(func)
+    def wrapper(conn, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(conn, query, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            params = args[0] if args else kwargs.get("params", ())
+            profiler.record(conn, query, params, duration)
+    return wrapper
+
+
+@log_queries_module.log_queries(sample_rate=0.1, slow_threshold=0.1)
+@with_db_connection
+@profile_queries
+def run_query(conn, query, params=()):
+    return conn.execute(query, params).fetchall()
+
+
+if __name__ == "__main__":
+    log_queries_module.setup_query_logging()
+    profiler.dump_at_exit(sys.stdout)
+    for user_id in range(1, 50):
+        run_query("SELECT * FROM users WHERE id = ?", (user_id,))
+        run_query("SELECT * FROM users WHERE email = ?",
+                  (f"user{user_id}@example.com",))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the query cache in 4-cache_query.
+"""
+
+import sqlite3
+import threading
+import time
+import unittest
+from typing import Any, List
+
+cache_query_module = __import__('4-cache_query')
+QueryCache = cache_query_module.QueryCache
+cache_query = cache_query_module.cache_query
+make_key = cache_query_module.make_key
+
+
+def wait_until(predicate: Any, timeout: float = 2.0) -> bool:
+    """Polls predicate until it is true or timeout seconds have passed."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests that concurrent identical misses share one execution."""
+
+    def test_concurrent_misses_run_query_once(self) -> None:
+        """Test that 50 concurrent callers run a slow query only once."""
+        callers = 50
+        cache = QueryCache()
+        executions: List[str] = []
+        results: List[Any] = []
+        start = threading.Barrier(callers)
+
+        @cache_query(cache=cache)
+        def slow_query(conn: Any, query: str, params: Any = ()) -> Any:
+            executions.append(query)
+            time.sleep(0.1)
+            return [("result",)]
+
+        def call() -> None:
+            start.wait()
+            results.append(slow_query(None, "SELECT * FROM users"))
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(results, [[("result",)]] * callers)
+        self.assertEqual(cache.stats["coalesced"], callers - 1)
+
+
+class TestStaleRefresh(unittest.TestCase):
+    """Tests the background refresh of stale entries."""
+
+    def test_failed_refresh_does_not_hang_later_callers(self) -> None:
+        """
+        Test that a refresh whose connect() raises still finishes its
+        flight, so the next miss on the key runs the query instead of
+        waiting forever.
+        """
+        cache = QueryCache()
+        calls: List[Any] = []
+
+        def connect() -> Any:
+            raise sqlite3.OperationalError("unable to open database file")
+
+        @cache_query(cache=cache, ttl=0.05, stale_ttl=0.1, connect=connect)
+        def query(conn: Any, query: str, params: Any = ()) -> Any:
+            calls.append(conn)
+            return [(len(calls),)]
+
+        self.assertEqual(query("conn", "SELECT * FROM users"), [(1,)])
+
+        time.sleep(0.07)
+        # Expired but within stale_ttl: served stale, refresh fails
+        self.assertEqual(query("conn", "SELECT * FROM users"), [(1,)])
+        self.assertTrue(wait_until(lambda: not cache._inflight))
+
+        time.sleep(0.1)
+        results: List[Any] = []
+        caller = threading.Thread(
+            target=lambda: results.append(
+                query("conn", "SELECT * FROM users")),
+            daemon=True)
+        caller.start()
+        caller.join(timeout=2)
+
+        self.assertFalse(caller.is_alive())
+        self.assertEqual(results, [[(2,)]])
+        self.assertEqual(cache._inflight, {})
+
+
+class TestMakeKey(unittest.TestCase):
+    """Tests the normalization of queries into cache keys."""
+
+    def test_whitespace_outside_literals_is_ignored(self) -> None:
+        """Test that layout differences map to the same key."""
+        self.assertEqual(
+            make_key("SELECT *\n  FROM users WHERE id = ?;", (1,)),
+            make_key("SELECT * FROM users WHERE id = ?", (1,)))
+
+    def test_whitespace_inside_literals_is_kept(self) -> None:
+        """Test that literals differing only in spacing do not collide."""
+        self.assertNotEqual(
+            make_key("SELECT * FROM users WHERE name = 'a  b'"),
+            make_key("SELECT * FROM users WHERE name = 'a b'"))
+
+    def test_literals_cache_separately(self) -> None:
+        """Test that queries differing inside a literal get own results."""
+        cache = QueryCache()
+
+        @cache_query(cache=cache)
+        def query(conn: Any, query: str, params: Any = ()) -> Any:
+            return [(query,)]
+
+        spaced = "SELECT * FROM users WHERE name = 'a  b'"
+        single = "SELECT * FROM users WHERE name = 'a b'"
+        self.assertEqual(query(None, spaced), [(spaced,)])
+        self.assertEqual(query(None, single), [(single,)])
+        self.assertEqual(cache.stats["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,7 @@ if connection:
 
     if connection:
         seed.create_table(connection)
+        seed.migrate_user_data(connection)
         seed.insert_data(connection, 'user_data.csv')
         cursor = connection.cursor()
         cursor.execute(
@@ -19,7 +20,7 @@ if connection:
         result = cursor.fetchone()
         if result:
             print(f"Database ALX_prodev is present ")
-        cursor.execute(f"SELECT * FROM user_data LIMIT 5;")
+        cursor.execute(f"SELECT {seed.USER_FIELDS} FROM user_data LIMIT 5;")
         rows = cursor.fetchall()
         print(rows)
         cursor.close()
@@ -2,39 +2,41 @@
 A generator function that streams rows from the user_data
 table in a MySQL database one record at a time.
 """
-import os
-import mysql.connector
 from dotenv import load_dotenv
 from mysql.connector import Error
+import seed
 
 load_dotenv()
 
 
-def stream_users():
+def stream_users(batch_size=1000, row_format="dict"):
     """
-    Connects to the 'ALX_prodev' database and yields
+    Checks a connection out of the shared pool and yields
     user records one by one. This approach is highly memory-efficient.
+
+    Rows are read through an unbuffered cursor in fetchmany(batch_size)
+    chunks, so at most one chunk is held on the client. row_format
+    selects dicts, tuples or namedtuples (see seed.ROW_FORMATS).
     """
+    pool = seed.get_pool()
+    db_connection = cursor = None
     try:
-        db_connection = mysql.connector.connect(
-            database="ALX_prodev",
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST")
-        )
-        cursor = db_connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data;")
+        db_connection = pool.get()
+        cursor = seed.streaming_cursor(db_connection, row_format)
+        cursor.execute(f"SELECT {seed.USER_FIELDS} FROM user_data;")
 
-        # Iterate over the cursor, yielding each row
-        for user_record in cursor:
-            yield user_record
+        # Pull a chunk at a time, yielding each row
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
 
     except Error as e:
         print(f"A database error occurred: {e}")
         # The generator will stop here
     finally:
-        # Ensure the cursor and connection are closed in all cases
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'db_connection' in locals() and db_connection:
-            db_connection.close()
+        # Ensure the cursor is closed and the connection returned
+        seed.close_stream(cursor)
+        if db_connection:
+            pool.put(db_connection)
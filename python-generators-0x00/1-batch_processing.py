@@ -2,39 +2,44 @@
 This script contains generator functions for fetching and processing
 data from a MySQL database in manageable batches.
 """
-import os
-import mysql.connector
+from array import array
+from itertools import compress
 from dotenv import load_dotenv
 from mysql.connector import Error
+import seed
+import parallel_scan
+
+try:
+    import numpy
+except ImportError:  # Columnar batches fall back to array.array
+    numpy = None
 
 
 load_dotenv()
 
+USER_COLUMNS = ("user_id", "name", "email", "age")
+
 
-def stream_users_in_batches(batch_size):
+def stream_users_in_batches(batch_size, row_format="dict"):
     """
     A generator that retrieves user records from the database in specific batch sizes.
-    Each yielded item is a list of user dictionaries.
+    Each yielded item is a list of user rows, as dicts by default or as
+    tuples/namedtuples when row_format says so (see seed.ROW_FORMATS).
+
+    Batches come straight from fetchmany on an unbuffered cursor, so the
+    result set is never buffered on the client.
     """
+    pool = seed.get_pool()
+    db_connection = cursor = None
     try:
-        db_connection = mysql.connector.connect(
-            database="ALX_prodev",
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST")
-        )
-        cursor = db_connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data;")
-
-        current_batch = []
-        for row in cursor:
-            current_batch.append(row)
-            if len(current_batch) == batch_size:
-                yield current_batch
-                current_batch = []
-
-        # Yield any remaining rows in the final batch
-        if current_batch:
+        db_connection = pool.get()
+        cursor = seed.streaming_cursor(db_connection, row_format)
+        cursor.execute(f"SELECT {seed.USER_FIELDS} FROM user_data;")
+
+        while True:
+            current_batch = cursor.fetchmany(batch_size)
+            if not current_batch:
+                break
             yield current_batch
 
     except Error as e:
@@ -42,10 +47,64 @@ def stream_users_in_batches(batch_size):
         return
         # The generator will stop here
     finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'db_connection' in locals() and db_connection:
-            db_connection.close()
+        seed.close_stream(cursor)
+        if db_connection:
+            pool.put(db_connection)
+
+
+def stream_users_columnar(batch_size, use_numpy=True):
+    """
+    A generator that yields each fetchmany batch as columns instead of
+    rows: a dict mapping column name to a list of values, except for
+    'age', which is a uint8 NumPy array matching its TINYINT UNSIGNED
+    column (or an array.array('B') when NumPy is unavailable or
+    use_numpy is false).
+    """
+    as_numpy = use_numpy and numpy is not None
+    for rows in stream_users_in_batches(batch_size, row_format="tuple"):
+        columns = dict(zip(USER_COLUMNS, zip(*rows)))
+        batch = {name: list(values) for name, values in columns.items()}
+        if as_numpy:
+            batch["age"] = numpy.fromiter(
+                columns["age"], dtype=numpy.uint8, count=len(rows))
+        else:
+            batch["age"] = array("B", columns["age"])
+        yield batch
+
+
+def filter_columns(batch, mask):
+    """Returns the rows of a columnar batch selected by a boolean mask."""
+    if numpy is not None and isinstance(batch["age"], numpy.ndarray):
+        indices = numpy.flatnonzero(mask)
+        return {name: values[indices] if name == "age"
+                else [values[i] for i in indices]
+                for name, values in batch.items()}
+    mask = list(mask)
+    selected = {name: list(compress(values, mask))
+                for name, values in batch.items()}
+    selected["age"] = array("B", selected["age"])
+    return selected
+
+
+def older_than_25_columnar(batch):
+    """Vectorized age > 25 filter over a columnar batch."""
+    ages = batch["age"]
+    if numpy is not None and isinstance(ages, numpy.ndarray):
+        return filter_columns(batch, ages > 25)
+    return filter_columns(batch, (age > 25 for age in ages))
+
+
+def vectorized_batch_processing(batch_size):
+    """
+    Same output as batch_processing, but each batch is filtered as
+    columns in one vectorized step instead of row by row.
+    """
+    for user_batch in stream_users_columnar(batch_size):
+        selected = older_than_25_columnar(user_batch)
+        # tolist() turns the age array back into plain ints
+        selected["age"] = selected["age"].tolist()
+        for row in zip(*selected.values()):
+            print(dict(zip(selected, row)))
 
 
 def batch_processing(batch_size):
@@ -56,3 +115,19 @@ def batch_processing(batch_size):
         for user in user_batch:
             if user.get("age") and user["age"] > 25:
                 print(user)
+
+
+def filter_older_than_25(user_batch):
+    """Returns the users in user_batch whose age exceeds 25."""
+    return [user for user in user_batch
+            if user.get("age") and user["age"] > 25]
+
+
+def parallel_batch_processing(batch_size, workers=None):
+    """
+    Same output as batch_processing, but the table is split into user_id
+    ranges that are scanned and filtered on `workers` processes.
+    """
+    for user in parallel_scan.parallel_scan(
+            filter_older_than_25, workers=workers, batch_size=batch_size):
+        print(user)
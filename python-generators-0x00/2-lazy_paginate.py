@@ -3,33 +3,183 @@
 """
 This script implements a generator for fetching paginated data from a
 database in a memory-efficient manner.
+
+Pages are fetched with keyset (seek) pagination: each query resumes
+right after the last key seen instead of skipping OFFSET rows, so every
+page costs the same no matter how deep into the table it is.
 """
+import queue
+import threading
 import seed
 
+# Columns that may be used as the pagination key. Identifiers cannot be
+# bound as query parameters, so they are checked against this list.
+KEY_COLUMNS = ("user_id", "name", "email", "age")
+PRIMARY_KEY = "user_id"
+
 
 def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
+    """Fetches one page of users with LIMIT/OFFSET (kept for comparison)."""
+    with seed.pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                f"SELECT {seed.USER_FIELDS} FROM user_data "
+                "LIMIT %s OFFSET %s",
+                (page_size, offset))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def paginate_users_after(connection, page_size, last_key=None,
+                         key=PRIMARY_KEY):
+    """
+    Fetches the page of at most page_size users that follows last_key
+    when ordered by key, using the given open connection.
+
+    For the primary key, last_key is the last user_id seen. For any
+    other column, ties are broken on user_id and last_key must be the
+    (value, user_id) pair of the last row seen.
+    """
+    if key not in KEY_COLUMNS:
+        raise ValueError(f"Cannot paginate on unknown column: {key}")
+
+    if key == PRIMARY_KEY:
+        order_by = PRIMARY_KEY
+        where, params = "", ()
+        if last_key is not None:
+            where = f"WHERE {PRIMARY_KEY} > UUID_TO_BIN(%s)"
+            params = (last_key,)
+    else:
+        order_by = f"{key}, {PRIMARY_KEY}"
+        where, params = "", ()
+        if last_key is not None:
+            where = (f"WHERE ({key}, {PRIMARY_KEY}) > "
+                     "(%s, UUID_TO_BIN(%s))")
+            params = tuple(last_key)
+
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(
-        f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+    try:
+        cursor.execute(
+            f"SELECT {seed.USER_FIELDS} FROM user_data {where} "
+            f"ORDER BY {order_by} LIMIT %s",
+            params + (page_size,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
 
 
-def lazy_paginate(page_size):
+def _last_key(page, key):
+    """Returns the resume key for the page following page."""
+    last = page[-1]
+    if key == PRIMARY_KEY:
+        return last[PRIMARY_KEY]
+    return (last[key], last[PRIMARY_KEY])
+
+
+def lazy_paginate(page_size, key=PRIMARY_KEY, start_after=None):
     """
     A generator that lazily fetches and yields user data page by page.
     This approach avoids loading the entire dataset into memory.
+
+    A single pooled connection is reused for every page, and the last
+    key of each page is remembered so the next page seeks straight to it.
+    """
+    last_key = start_after
+    with seed.pooled_connection() as connection:
+        while True:
+            # Fetch the next page of results
+            page = paginate_users_after(connection, page_size, last_key, key)
+
+            if not page:  # If empty, we have reached the end of the data
+                break
+            yield page  # Yield the page data to the caller
+
+            if len(page) < page_size:  # A short page is the last one
+                break
+            last_key = _last_key(page, key)
+
+
+_END = object()
+
+
+class _PageError:
+    """Carries an exception raised by the producer thread."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(pages, depth=2):
+    """
+    Iterates `pages` on a background thread, keeping up to `depth`
+    pages fetched ahead of the consumer so that database round trips
+    overlap with the consumer's work.
+
+    The bounded queue applies backpressure: the producer blocks once
+    `depth` pages are waiting. Exceptions raised while fetching are
+    re-raised in the consumer, and when the consumer stops early the
+    producer is told to stop and closes `pages` on its own thread.
+    """
+    buffer = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        """Blocks until item is queued, giving up once stop is set."""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(pages)
+        try:
+            for page in iterator:
+                if not put(page):
+                    break
+            else:
+                put(_END)
+        except Exception as e:
+            put(_PageError(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True,
+                                name="lazy_paginate-prefetch")
+    producer.start()
+    try:
+        while True:
+            page = buffer.get()
+            if page is _END:
+                break
+            if isinstance(page, _PageError):
+                raise page.error
+            yield page
+    finally:
+        stop.set()
+        producer.join()
+
+
+def lazy_paginate_prefetched(page_size, depth=2, key=PRIMARY_KEY):
+    """lazy_paginate with up to `depth` pages fetched ahead (see prefetch)."""
+    yield from prefetch(lazy_paginate(page_size, key), depth)
+
+
+def lazy_paginate_offset(page_size):
+    """
+    The original LIMIT/OFFSET pagination, kept as the baseline for
+    benchmark.py.
     """
     current_offset = 0
     while True:
-        # Fetch the next page of results
         page = paginate_users(page_size, current_offset)
-
-        if not page:  # If empty, we have reached the end of the data
+        if not page:
             break
-        yield page  # Yield the page data to the caller
-
-        # Increment the offset for the next iteration
+        yield page
         current_offset += page_size
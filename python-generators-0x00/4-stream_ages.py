@@ -5,50 +5,60 @@ This script demonstrates how to compute an aggregate function
 (average age) for a large dataset using a generator to
 conserve memory.
 """
-import os
 import seed
+import aggregate
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
 
-def stream_user_ages():
+def stream_user_ages(batch_size=10000):
     """
     A generator that retrieves and yields the age for each user
     from the database one by one.
-    """
-    db_conn = seed.connect_to_prodev()
-    if not db_conn:
-        return
-
-    cursor = db_conn.cursor(dictionary=True)
-    cursor.execute("SELECT age FROM user_data;")
 
-    try:
-        for record in cursor:
-            yield record["age"]
-    finally:
-        cursor.close()
-        db_conn.close()
+    Ages are pulled as plain tuples in fetchmany(batch_size) chunks
+    through an unbuffered cursor.
+    """
+    with seed.pooled_connection() as db_conn:
+        cursor = seed.streaming_cursor(db_conn, "tuple")
+        try:
+            cursor.execute("SELECT age FROM user_data;")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for (age,) in rows:
+                    yield age
+        finally:
+            seed.close_stream(cursor)
 
 
-def calculate_average_age():
+def calculate_average_age(pushdown=True):
     """
-    Computes the average age of all users by iterating over
-    the stream without loading the entire dataset into memory.
+    Computes the average age of all users without loading the entire
+    dataset into memory.
+
+    By default the average is computed by MySQL (AVG) so only one value
+    crosses the wire; with pushdown=False the ages are streamed and
+    averaged in a single pass instead.
     """
-    total_age = 0
-    user_count = 0
+    if pushdown:
+        result = aggregate.aggregate(("avg", "count"))
+        avg_age, user_count = result["avg"], result["count"]
+    else:
+        total_age = 0
+        user_count = 0
 
-    # Iterate over the generator to get each age
-    for age in stream_user_ages():
-        total_age += age
-        user_count += 1
+        # Iterate over the generator to get each age
+        for age in stream_user_ages():
+            total_age += age
+            user_count += 1
+        avg_age = total_age / user_count if user_count else None
 
-    # Calculate the average and print the result
+    # Print the result
     if user_count > 0:
-        avg_age = total_age / user_count
         print(f"Average age of users: {avg_age:.2f}")
     else:
         print("No users found to calculate the average age.")
@@ -0,0 +1,300 @@
+"""
+aggregate.py
+Aggregates (avg, sum, min, max, count, variance, stddev, percentiles)
+over a column of the user_data table, optionally grouped.
+
+Whenever every requested aggregate has a SQL equivalent the work is
+pushed down to MySQL as a single SELECT ... GROUP BY. Otherwise the
+column is streamed in fetchmany chunks through single-pass accumulators:
+Welford's algorithm for the moments and a merging t-digest sketch for
+percentiles, so memory stays bounded however large the table is.
+"""
+import math
+import re
+from decimal import Decimal
+import seed
+
+# Columns that can be grouped by, and those that can be aggregated
+COLUMNS = ("user_id", "name", "email", "age")
+NUMERIC_COLUMNS = ("age",)
+
+# Aggregates MySQL can compute itself
+SQL_FUNCTIONS = {
+    "avg": "AVG",
+    "sum": "SUM",
+    "min": "MIN",
+    "max": "MAX",
+    "count": "COUNT",
+    "variance": "VAR_POP",
+    "stddev": "STDDEV_POP",
+}
+
+# Percentiles are requested as "p50", "p95", "p99.9", ...
+PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?|100)$")
+
+
+class RunningStats:
+    """Single-pass count/sum/min/max/mean/variance (Welford)."""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "mean", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        """Adds one value to the running statistics."""
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        """Folds another RunningStats into this one (Chan et al.)."""
+        if not other.count:
+            return
+        if not self.count:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += (other._m2
+                     + delta * delta * self.count * other.count / count)
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def result(self, func):
+        """Returns the value of the named aggregate."""
+        if func == "count":
+            return self.count
+        if not self.count:
+            return None
+        if func == "variance":
+            return self._m2 / self.count
+        if func == "stddev":
+            return math.sqrt(self._m2 / self.count)
+        return {"avg": self.mean, "sum": self.total,
+                "min": self.minimum, "max": self.maximum}[func]
+
+
+class TDigest:
+    """
+    A merging t-digest: an approximate quantile sketch whose size is set
+    by `compression` and grows only logarithmically with the values added.
+    Accuracy is best at the tails, which is where p95/p99 live.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self._centroids = []  # sorted (mean, weight) pairs
+        self._buffer = []
+        self.count = 0
+
+    def add(self, value, weight=1):
+        """Adds a value to the sketch."""
+        self._buffer.append((value, weight))
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        """Folds another TDigest into this one."""
+        other._compress()
+        for centroid in other._centroids:
+            self.add(*centroid)
+
+    def _compress(self):
+        """Merges buffered values into the centroid list."""
+        if not self._buffer:
+            return
+        points = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+
+        centroids = []
+        seen = 0.0
+        mean, weight = points[0]
+        for next_mean, next_weight in points[1:]:
+            q = (seen + weight + next_weight / 2) / total
+            limit = 4 * total * q * (1 - q) / self.compression
+            if weight + next_weight <= max(1, limit):
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                centroids.append((mean, weight))
+                seen += weight
+                mean, weight = next_mean, next_weight
+        centroids.append((mean, weight))
+
+        self._centroids = centroids
+        self.count = total
+
+    def quantile(self, q):
+        """Returns the estimated value at quantile q (0 <= q <= 1)."""
+        self._compress()
+        if not self._centroids:
+            return None
+        target = q * self.count
+        seen = 0.0
+        previous = None  # (center, mean) of the previous centroid
+        for mean, weight in self._centroids:
+            center = seen + weight / 2
+            if target <= center:
+                if previous is None:
+                    return mean
+                prev_center, prev_mean = previous
+                fraction = (target - prev_center) / (center - prev_center)
+                return prev_mean + fraction * (mean - prev_mean)
+            previous = (center, mean)
+            seen += weight
+        return self._centroids[-1][0]
+
+
+class StreamingAggregate:
+    """Accumulates any mix of supported aggregates in a single pass."""
+
+    def __init__(self, funcs, compression=100):
+        self.funcs = tuple(funcs)
+        self.stats = RunningStats()
+        self.digest = None
+        if any(PERCENTILE.match(func) for func in self.funcs):
+            self.digest = TDigest(compression)
+
+    def add(self, value):
+        """Adds one (non-NULL) value."""
+        self.stats.add(value)
+        if self.digest is not None:
+            self.digest.add(value)
+
+    def merge(self, other):
+        """Folds another StreamingAggregate over the same funcs into this."""
+        self.stats.merge(other.stats)
+        if self.digest is not None:
+            self.digest.merge(other.digest)
+
+    def result(self):
+        """Returns a {func: value} dict."""
+        results = {}
+        for func in self.funcs:
+            match = PERCENTILE.match(func)
+            if match:
+                results[func] = self.digest.quantile(
+                    float(match.group(1)) / 100)
+            else:
+                results[func] = self.stats.result(func)
+        return results
+
+
+def _check(funcs, column, group_by):
+    """Validates identifiers, which cannot be bound as parameters."""
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f"Cannot aggregate non-numeric column: {column}")
+    if group_by is not None and group_by not in COLUMNS:
+        raise ValueError(f"Unknown column: {group_by}")
+    for func in funcs:
+        if func not in SQL_FUNCTIONS and not PERCENTILE.match(func):
+            raise ValueError(f"Unknown aggregate: {func}")
+
+
+def aggregate_sql(conn, funcs, column="age", group_by=None):
+    """
+    Computes funcs entirely in MySQL. Returns {func: value}, or
+    {group: {func: value}} when group_by is given.
+    """
+    _check(funcs, column, group_by)
+    select = ", ".join(f"{SQL_FUNCTIONS[func]}({column})" for func in funcs)
+    query = f"SELECT {select} FROM user_data"
+    if group_by:
+        query = (f"SELECT {group_by}, {select} FROM user_data "
+                 f"GROUP BY {group_by}")
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    def as_dict(values):
+        return {func: _number(value) for func, value in zip(funcs, values)}
+
+    if group_by:
+        return {row[0]: as_dict(row[1:]) for row in rows}
+    return as_dict(rows[0])
+
+
+def aggregate_stream(conn, funcs, column="age", group_by=None,
+                     batch_size=10000, compression=100):
+    """
+    Computes funcs in one pass over the streamed column, reading rows in
+    fetchmany(batch_size) chunks. Returns the same shapes as
+    aggregate_sql.
+    """
+    _check(funcs, column, group_by)
+    select = f"{group_by}, {column}" if group_by else column
+    groups = {}
+
+    cursor = seed.streaming_cursor(conn, "tuple")
+    try:
+        cursor.execute(f"SELECT {select} FROM user_data")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                key, value = (row[0], row[1]) if group_by else (None, row[0])
+                if value is None:
+                    continue
+                acc = groups.get(key)
+                if acc is None:
+                    acc = groups[key] = StreamingAggregate(funcs, compression)
+                acc.add(_number(value))
+    finally:
+        cursor.close()
+
+    if group_by:
+        return {key: acc.result() for key, acc in groups.items()}
+    acc = groups.get(None) or StreamingAggregate(funcs, compression)
+    return acc.result()
+
+
+def aggregate(funcs=("avg",), column="age", group_by=None, conn=None,
+              pushdown=True, batch_size=10000):
+    """
+    Computes funcs over user_data.column, grouped by group_by if given.
+
+    The query is pushed down to MySQL when pushdown is true and every
+    func has a SQL equivalent; otherwise it falls back to streaming.
+    A connection is taken from the shared pool if conn is not given.
+    """
+    funcs = tuple(funcs)
+    if conn is None:
+        with seed.pooled_connection() as conn:
+            return aggregate(funcs, column, group_by, conn, pushdown,
+                             batch_size)
+    if pushdown and all(func in SQL_FUNCTIONS for func in funcs):
+        return aggregate_sql(conn, funcs, column, group_by)
+    return aggregate_stream(conn, funcs, column, group_by, batch_size)
+
+
+def _number(value):
+    """
+    Converts MySQL DECIMAL values (AVG, SUM) to float, leaving ints alone,
+    so min/max of an integer column are ints on both the SQL and the
+    streaming path.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
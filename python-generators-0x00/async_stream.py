@@ -0,0 +1,173 @@
+"""
+async_stream.py
+Async-generator equivalents of the user_data streaming generators,
+backed by aiomysql and a shared aiomysql connection pool.
+
+Every generator prefetches: a background task fetches the next batch
+(or page) while the consumer is still processing the current one, with
+at most `prefetch` batches buffered. This lets an ASGI service stream
+users without blocking a thread on network I/O.
+
+Example:
+    async for user in stream_users():
+        ...
+"""
+import os
+import asyncio
+import aiomysql
+from dotenv import load_dotenv
+import seed
+
+
+load_dotenv()
+
+_pool = None
+_pool_lock = asyncio.Lock()
+_END = object()
+
+
+async def get_pool(size=None):
+    """
+    Returns the shared aiomysql pool, creating it on first use.
+    Its size comes from `size`, else DB_POOL_SIZE, else 5.
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(
+                db="ALX_prodev",
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST"),
+                maxsize=size or int(os.getenv("DB_POOL_SIZE", "5")),
+                autocommit=True
+            )
+        return _pool
+
+
+async def close_pool():
+    """Closes the shared pool, e.g. on application shutdown."""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            await _pool.wait_closed()
+            _pool = None
+
+
+async def _prefetched(batches, prefetch):
+    """
+    Runs the async generator `batches` in a background task, keeping up
+    to `prefetch` batches queued ahead of the consumer, and yields them.
+    Errors are re-raised in the consumer; stopping early cancels the
+    producer.
+    """
+    queue = asyncio.Queue(maxsize=max(1, prefetch))
+
+    async def produce():
+        try:
+            async for batch in batches:
+                await queue.put(batch)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await batches.aclose()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is _END:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def _query_batches(query, params, batch_size, cursor_class):
+    """
+    Streams the rows of query in fetchmany(batch_size) chunks through a
+    server-side cursor on a pooled connection.
+    """
+    pool = await get_pool()
+    conn = await pool.acquire()
+    finished = False
+    try:
+        cursor = await conn.cursor(cursor_class)
+        await cursor.execute(query, params)
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        finished = True
+        await cursor.close()
+    finally:
+        if not finished:
+            # Closing a server-side cursor drains its unread rows, so
+            # drop the connection instead when stopping early.
+            conn.close()
+        pool.release(conn)
+
+
+async def stream_users_in_batches(batch_size, prefetch=2):
+    """Yields lists of user dicts, batch_size at a time."""
+    batches = _query_batches(f"SELECT {seed.USER_FIELDS} FROM user_data", (),
+                             batch_size, aiomysql.SSDictCursor)
+    async for batch in _prefetched(batches, prefetch):
+        yield batch
+
+
+async def stream_users(batch_size=1000, prefetch=2):
+    """Yields user dicts one at a time."""
+    async for batch in stream_users_in_batches(batch_size, prefetch):
+        for user in batch:
+            yield user
+
+
+async def _keyset_pages(page_size):
+    """Fetches user_data pages in user_id order, seeking past the last key."""
+    pool = await get_pool()
+    last_key = None
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            while True:
+                if last_key is None:
+                    await cursor.execute(
+                        f"SELECT {seed.USER_FIELDS} FROM user_data "
+                        "ORDER BY user_id LIMIT %s",
+                        (page_size,))
+                else:
+                    await cursor.execute(
+                        f"SELECT {seed.USER_FIELDS} FROM user_data "
+                        "WHERE user_id > UUID_TO_BIN(%s) "
+                        "ORDER BY user_id LIMIT %s", (last_key, page_size))
+                page = await cursor.fetchall()
+                if not page:
+                    break
+                yield page
+                if len(page) < page_size:
+                    break
+                last_key = page[-1]["user_id"]
+
+
+async def lazy_paginate(page_size, prefetch=1):
+    """Yields pages of user dicts, fetching the next page in the background."""
+    async for page in _prefetched(_keyset_pages(page_size), prefetch):
+        yield page
+
+
+async def stream_user_ages(batch_size=10000, prefetch=2):
+    """Yields the age of each user one at a time."""
+    batches = _query_batches("SELECT age FROM user_data", (), batch_size,
+                             aiomysql.SSCursor)
+    async for batch in _prefetched(batches, prefetch):
+        for (age,) in batch:
+            yield age
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+
+"""
+Benchmarks for the user_data streaming generators.
+
+Usage:
+    python3 benchmark.py pagination --rows 1000000 --page-size 1000
+    python3 benchmark.py memory --sizes 100000,1000000 --batch-size 1000
+    python3 benchmark.py columnar --batch-size 10000
+    python3 benchmark.py schema --batch-size 1000
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+import uuid
+import seed
+
+stream_users = __import__('0-stream_users')
+batch_processing = __import__('1-batch_processing')
+lazy_paginate = __import__('2-lazy_paginate')
+
+
+def grow_user_data(conn, target_rows):
+    """
+    Grows the 'user_data' table to at least target_rows rows by
+    repeatedly copying existing rows under fresh UUIDs.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM user_data;")
+        (count,) = cur.fetchone()
+        if count == 0:
+            raise ValueError("user_data is empty, run seed.py first")
+        while count < target_rows:
+            cur.execute(
+                "INSERT INTO user_data (user_id, name, email, age) "
+                "SELECT UUID_TO_BIN(UUID()), name, email, age "
+                "FROM user_data LIMIT %s",
+                (min(count, target_rows - count),))
+            conn.commit()
+            count += cur.rowcount
+        return count
+    finally:
+        cur.close()
+
+
+def _time_pages(pages):
+    """Drains a page generator, returning (rows, seconds)."""
+    start = time.perf_counter()
+    rows = 0
+    for page in pages:
+        rows += len(page)
+    return rows, time.perf_counter() - start
+
+
+def bench_pagination(page_size):
+    """
+    Compares keyset pagination, with and without read-ahead, against
+    the LIMIT/OFFSET baseline.
+    """
+    for label, pages in (
+            ("keyset", lazy_paginate.lazy_paginate(page_size)),
+            ("prefetch", lazy_paginate.lazy_paginate_prefetched(page_size)),
+            ("offset", lazy_paginate.lazy_paginate_offset(page_size))):
+        rows, elapsed = _time_pages(pages)
+        print(f"{label:>8}: {rows} rows in {elapsed:.2f}s "
+              f"({rows / elapsed if elapsed else 0:.0f} rows/sec)")
+
+
+def _stream_peak_rss(batch_size, row_format):
+    """
+    Drains stream_users in the current process and returns
+    (rows, peak RSS in KiB). Meant to run in a fresh child process.
+    """
+    rows = sum(1 for _ in stream_users.stream_users(batch_size, row_format))
+    return rows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_memory(sizes, batch_size):
+    """
+    Streams user_data at each table size and row format in a fresh
+    process, showing that peak RSS does not grow with the table.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    for size in sizes:
+        conn = seed.connect_to_prodev()
+        grow_user_data(conn, size)
+        conn.close()
+        for row_format in seed.ROW_FORMATS:
+            with ctx.Pool(1) as pool:
+                rows, peak = pool.apply(
+                    _stream_peak_rss, (batch_size, row_format))
+            print(f"{rows:>10} rows {row_format:>10}: "
+                  f"peak RSS {peak / 1024:.1f} MiB")
+
+
+def bench_columnar(batch_size):
+    """
+    Compares the row-by-row dict filter of batch_processing with the
+    vectorized filter over columnar batches, counting users over 25.
+    """
+    def dict_path():
+        return sum(
+            len(batch_processing.filter_older_than_25(batch))
+            for batch in batch_processing.stream_users_in_batches(batch_size))
+
+    def columnar_path():
+        return sum(
+            len(batch_processing.older_than_25_columnar(batch)["age"])
+            for batch in batch_processing.stream_users_columnar(batch_size))
+
+    for label, run in (("dict", dict_path), ("columnar", columnar_path)):
+        start = time.perf_counter()
+        matched = run()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>8}: {matched} users over 25 in {elapsed:.2f}s")
+
+
+# The original user_data schema, for before/after comparisons
+LEGACY_USER_DATA_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_id CHAR(36) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        age DECIMAL NOT NULL,
+        INDEX (user_id)
+    );
+"""
+
+
+def bench_schema(batch_size, csv_file="user_data.csv"):
+    """
+    Loads csv_file into a table with the original schema and one with
+    the compact schema, then compares load time, on-disk size, a full
+    scan and an age-range scan.
+    """
+    conn = seed.connect_to_prodev()
+    cur = conn.cursor()
+    variants = (
+        ("bench_legacy", LEGACY_USER_DATA_DDL,
+         lambda key: str(uuid.UUID(bytes=key)), "user_id"),
+        ("bench_compact", seed.USER_DATA_DDL, lambda key: key,
+         "BIN_TO_UUID(user_id)"),
+    )
+    try:
+        for table, ddl, to_key, user_id in variants:
+            cur.execute(f"DROP TABLE IF EXISTS {table};")
+            cur.execute(ddl.format(table=table))
+
+            start = time.perf_counter()
+            for batch in seed.read_csv_in_batches(csv_file, batch_size):
+                cur.executemany(
+                    f"INSERT INTO {table} (user_id, name, email, age) "
+                    "VALUES (%s, %s, %s, %s)",
+                    [(to_key(key), name, email, age)
+                     for key, name, email, age in batch])
+                conn.commit()
+            load = time.perf_counter() - start
+
+            cur.execute(f"ANALYZE TABLE {table};")
+            cur.fetchall()
+            cur.execute(
+                "SELECT DATA_LENGTH + INDEX_LENGTH "
+                "FROM INFORMATION_SCHEMA.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s;",
+                (table,))
+            (size,) = cur.fetchone()
+
+            start = time.perf_counter()
+            cur.execute(f"SELECT {user_id}, name, email, age FROM {table};")
+            rows = len(cur.fetchall())
+            scan = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cur.execute(
+                f"SELECT {user_id}, age FROM {table} "
+                "WHERE age BETWEEN 30 AND 40;")
+            matched = len(cur.fetchall())
+            age_scan = time.perf_counter() - start
+
+            print(f"{table:>14}: load {load:.2f}s, "
+                  f"size {size / 1024 / 1024:.1f} MiB, "
+                  f"full scan {rows} rows in {scan:.2f}s, "
+                  f"age 30-40 {matched} rows in {age_scan:.3f}s")
+            cur.execute(f"DROP TABLE {table};")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("benchmark", choices=("pagination", "memory",
+                                              "columnar", "schema"))
+    parser.add_argument("--rows", type=int, default=0,
+                        help="grow user_data to this many rows first")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sizes", default="100000,1000000",
+                        help="comma-separated table sizes for 'memory'")
+    args = parser.parse_args()
+
+    if args.rows:
+        conn = seed.connect_to_prodev()
+        print(f"user_data now holds {grow_user_data(conn, args.rows)} rows")
+        conn.close()
+
+    if args.benchmark == "pagination":
+        bench_pagination(args.page_size)
+    elif args.benchmark == "memory":
+        bench_memory([int(n) for n in args.sizes.split(",")],
+                     args.batch_size)
+    elif args.benchmark == "columnar":
+        bench_columnar(args.batch_size)
+    elif args.benchmark == "schema":
+        bench_schema(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
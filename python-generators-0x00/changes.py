@@ -0,0 +1,105 @@
+"""
+changes.py
+Incremental change capture for the user_data table.
+
+Every row carries an 'updated_at' timestamp (see seed.create_table and
+seed.add_change_tracking). Instead of rescanning the whole table, the
+generators here read only rows whose (updated_at, user_id) is past a
+stored high-watermark, using the (updated_at, user_id) index, so the
+cost of a sync follows the number of changes rather than the table size.
+"""
+import os
+import json
+import time
+from datetime import datetime
+import seed
+
+# Rows newer than this many seconds are left for the next poll, so a
+# transaction that commits slightly after a later one is not skipped.
+DEFAULT_SETTLE_LAG = 1.0
+
+
+def load_checkpoint(path):
+    """Returns the (updated_at, user_id) watermark stored at path, or None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    return (datetime.fromisoformat(state["updated_at"]), state["user_id"])
+
+
+def save_checkpoint(path, watermark):
+    """Atomically stores the (updated_at, user_id) watermark at path."""
+    updated_at, user_id = watermark
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": updated_at.isoformat(), "user_id": user_id},
+                  f)
+    os.replace(tmp, path)
+
+
+def _changed_page(conn, watermark, page_size, settle_lag):
+    """Fetches the next page of rows changed after watermark."""
+    conditions = ["updated_at < NOW(6) - INTERVAL %s MICROSECOND"]
+    params = [int(settle_lag * 1000000)]
+    if watermark is not None:
+        conditions.append("(updated_at, user_id) > (%s, UUID_TO_BIN(%s))")
+        params.extend(watermark)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"SELECT {seed.USER_FIELDS}, updated_at FROM user_data WHERE " +
+            " AND ".join(conditions) +
+            " ORDER BY updated_at, user_id LIMIT %s",
+            tuple(params) + (page_size,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def stream_changes(since=None, batch_size=1000,
+                   settle_lag=DEFAULT_SETTLE_LAG):
+    """
+    A generator that yields batches of rows changed after the
+    (updated_at, user_id) watermark `since` (everything if None), in
+    change order, until it has caught up.
+    """
+    watermark = since
+    with seed.pooled_connection() as conn:
+        while True:
+            page = _changed_page(conn, watermark, batch_size, settle_lag)
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            watermark = (page[-1]["updated_at"], page[-1]["user_id"])
+
+
+def follow_changes(checkpoint_path, batch_size=1000, min_interval=0.5,
+                   max_interval=30.0, settle_lag=DEFAULT_SETTLE_LAG):
+    """
+    Tails user_data forever, yielding batches of changed rows.
+
+    The watermark is loaded from checkpoint_path and saved there once
+    the consumer asks for the next batch, so a restart resumes after
+    the last processed batch (at-least-once delivery). When a poll finds
+    nothing, the wait before the next one doubles up to max_interval;
+    it drops back to min_interval as soon as changes appear.
+    """
+    watermark = load_checkpoint(checkpoint_path)
+    interval = min_interval
+    while True:
+        found = False
+        for page in stream_changes(watermark, batch_size, settle_lag):
+            found = True
+            yield page
+            watermark = (page[-1]["updated_at"], page[-1]["user_id"])
+            save_checkpoint(checkpoint_path, watermark)
+
+        if found:
+            interval = min_interval
+        else:
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+
+"""
+export.py
+Streams the user_data table to NDJSON, CSV or Parquet.
+
+Rows are read page by page with the keyset paginator from
+2-lazy_paginate.py and written incrementally, so memory stays bounded by
+one page. Each page is written as a self-contained chunk (its own
+gzip/bz2/xz member when compressed) and synced to disk, then the last
+exported user_id and the file's length are checkpointed next to it.
+--resume truncates whatever was written after the checkpoint, e.g. a
+page cut short by a crash, and continues from there.
+
+Usage:
+    python3 export.py users.ndjson.gz --format ndjson --compression gzip
+    python3 export.py users.csv --resume
+    python3 export.py users.parquet --format parquet --batch-size 50000
+"""
+import io
+import os
+import csv
+import sys
+import bz2
+import gzip
+import json
+import lzma
+import time
+import argparse
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Only needed for --format parquet
+    pyarrow = None
+
+lazy_paginate = __import__('2-lazy_paginate')
+
+FORMATS = ("ndjson", "csv", "parquet")
+COLUMNS = ("user_id", "name", "email", "age")
+# Each compresses one page into a complete stream; concatenated streams
+# decompress as one file with both these modules and the command-line
+# tools.
+TEXT_COMPRESSION = {"gzip": gzip.compress, "bz2": bz2.compress,
+                    "xz": lzma.compress}
+PARQUET_COMPRESSION = ("snappy", "gzip", "zstd", "brotli", "lz4", "none")
+
+
+def _state_path(path):
+    return f"{path}.state"
+
+
+def load_checkpoint(path):
+    """Returns the saved {'last_key', 'rows', 'offset'} for path, or None."""
+    try:
+        with open(_state_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, last_key, rows, offset=None):
+    """
+    Atomically records the last exported key for path and the length of
+    the output file once it was written.
+    """
+    tmp = _state_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"last_key": last_key, "rows": rows, "offset": offset}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _state_path(path))
+
+
+class _TextWriter:
+    """
+    Writes NDJSON or CSV, optionally compressed, one self-contained and
+    fsynced chunk per page. With offset set the file is truncated to it
+    and appended to.
+    """
+
+    def __init__(self, path, fmt, compression, offset=None):
+        if offset is None:
+            self.file = open(path, "wb")
+        else:
+            self.file = open(path, "r+b")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+        self.fmt = fmt
+        self.compress = TEXT_COMPRESSION.get(compression)
+        if fmt == "csv" and offset is None:
+            self._write_text(self._csv([COLUMNS]))
+
+    @property
+    def offset(self):
+        """Length of the file after the last completed page."""
+        return self.file.tell()
+
+    def write(self, page):
+        if self.fmt == "csv":
+            text = self._csv([row[col] for col in COLUMNS] for row in page)
+        else:
+            text = "".join(
+                json.dumps({col: row[col] for col in COLUMNS}) + "\n"
+                for row in page)
+        self._write_text(text)
+
+    def _csv(self, rows):
+        buffer = io.StringIO(newline="")
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    def _write_text(self, text):
+        data = text.encode("utf-8")
+        if self.compress:
+            data = self.compress(data)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Writes one Parquet row group per page."""
+
+    def __init__(self, path, compression):
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is required for Parquet export")
+        schema = pyarrow.schema([
+            ("user_id", pyarrow.string()),
+            ("name", pyarrow.string()),
+            ("email", pyarrow.string()),
+            ("age", pyarrow.int64()),
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(
+            path, schema, compression=compression or "snappy")
+        self.schema = schema
+
+    def write(self, page):
+        columns = {col: [row[col] for row in page] for col in COLUMNS}
+        self.writer.write_table(
+            pyarrow.table(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_users(path, fmt="ndjson", compression=None, batch_size=10000,
+                 resume=False, progress_every=5.0):
+    """
+    Exports user_data to path and returns the number of rows written.
+
+    Progress and throughput are printed to stderr at most every
+    `progress_every` seconds. With resume=True the export continues
+    after the last checkpointed user_id; Parquet files cannot be
+    appended to, so they can only be exported from the start.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    codecs = PARQUET_COMPRESSION if fmt == "parquet" else TEXT_COMPRESSION
+    if compression and compression not in codecs:
+        raise ValueError(f"{compression} is not supported for {fmt}")
+    checkpoint = load_checkpoint(path) if resume else None
+    if checkpoint and fmt == "parquet":
+        raise ValueError("Parquet exports cannot be resumed")
+    if checkpoint and checkpoint.get("offset") is None:
+        raise ValueError(f"{_state_path(path)} records no file offset; "
+                         "export again without resume")
+
+    last_key = checkpoint["last_key"] if checkpoint else None
+    rows = checkpoint["rows"] if checkpoint else 0
+    if fmt == "parquet":
+        writer = _ParquetWriter(path, compression)
+    else:
+        writer = _TextWriter(path, fmt, compression,
+                             checkpoint["offset"] if checkpoint else None)
+
+    start = last_report = time.perf_counter()
+    exported = 0
+    try:
+        for page in lazy_paginate.lazy_paginate(
+                batch_size, start_after=last_key):
+            writer.write(page)
+            exported += len(page)
+            last_key = page[-1]["user_id"]
+            save_checkpoint(path, last_key, rows + exported,
+                            getattr(writer, "offset", None))
+
+            now = time.perf_counter()
+            if now - last_report >= progress_every:
+                last_report = now
+                print(f"{rows + exported} rows exported "
+                      f"({exported / (now - start):.0f} rows/sec)",
+                      file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Exported {exported} rows to {path} in {elapsed:.2f}s "
+          f"({exported / elapsed if elapsed else 0:.0f} rows/sec)",
+          file=sys.stderr)
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export user_data.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--compression", choices=sorted(
+        set(TEXT_COMPRESSION) | set(PARQUET_COMPRESSION)))
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args()
+
+    export_users(args.path, args.format, args.compression, args.batch_size,
+                 args.resume)
+
+
+if __name__ == "__main__":
+    main()
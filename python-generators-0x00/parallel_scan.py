@@ -0,0 +1,168 @@
+"""
+parallel_scan.py
+Partitioned scan of the user_data table across worker processes.
+
+The user_id key space is split into contiguous ranges holding roughly
+equal numbers of rows, using boundaries sampled from the table, and each
+range is streamed by its own process over its own connection. A user-supplied
+function is applied to every fetchmany batch inside the worker, so
+CPU-heavy per-row work runs on all cores, and only its results are sent
+back to the caller as a single generator.
+
+Workers are started with the "spawn" method, so `process` must be a
+picklable module-level function and the calling script needs an
+`if __name__ == "__main__":` guard.
+"""
+import os
+import queue
+import multiprocessing
+import seed
+
+_ROWS = "rows"
+_DONE = "done"
+_ERROR = "error"
+
+# Keys sampled per partition when choosing range boundaries
+_SAMPLES_PER_PARTITION = 100
+
+# Seconds between liveness checks of the workers while waiting for output
+_POLL_INTERVAL = 1.0
+
+
+def key_ranges(partitions):
+    """
+    Splits user_data into at most `partitions` contiguous (low, high)
+    user_id ranges of roughly equal row counts. low is inclusive, high
+    exclusive, and None leaves that end of the range open.
+
+    Boundaries are quantiles of a random sample of the keys rather than
+    even splits of the key space, since keys generated by MySQL's UUID()
+    (version 1) share their leading bits and would all land in one range.
+    """
+    if partitions <= 1:
+        return [(None, None)]
+    with seed.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            count = cursor.fetchone()[0]
+            if not count:
+                return [(None, None)]
+            fraction = min(1.0,
+                           partitions * _SAMPLES_PER_PARTITION / count)
+            cursor.execute(
+                "SELECT HEX(user_id) FROM user_data WHERE RAND() < %s",
+                (fraction,))
+            sample = sorted(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    bounds = sorted({sample[i * len(sample) // partitions]
+                     for i in range(1, partitions)} if sample else ())
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _range_clause(key_range):
+    """Builds the WHERE clause and parameters selecting key_range."""
+    low, high = key_range
+    conditions, params = [], []
+    if low is not None:
+        conditions.append("user_id >= UNHEX(%s)")
+        params.append(low)
+    if high is not None:
+        conditions.append("user_id < UNHEX(%s)")
+        params.append(high)
+    if not conditions:
+        return "", ()
+    return "WHERE " + " AND ".join(conditions), tuple(params)
+
+
+def _scan_range(index, key_range, process, batch_size, row_format, results):
+    """Worker body: streams one key range and ships process() output."""
+    conn = cursor = None
+    try:
+        conn = seed.connect_to_prodev()
+        if not conn:
+            raise ConnectionError("could not connect to 'ALX_prodev'")
+        cursor = seed.streaming_cursor(conn, row_format)
+        where, params = _range_clause(key_range)
+        cursor.execute(
+            f"SELECT {seed.USER_FIELDS} FROM user_data {where}", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            output = list(process(rows))
+            if output:
+                results.put((index, _ROWS, output))
+        results.put((index, _DONE, None))
+    except Exception as e:
+        results.put((index, _ERROR, repr(e)))
+    finally:
+        seed.close_stream(cursor, conn)
+
+
+def parallel_scan(process, workers=None, batch_size=1000, ordered=False,
+                  row_format="dict", queue_size=64):
+    """
+    Scans user_data with `workers` processes (default: one per CPU),
+    calling process(batch) on every fetched batch of rows and yielding
+    each item of the iterables it returns.
+
+    With ordered=False items are yielded as soon as any worker produces
+    them. With ordered=True they are yielded in user_id range order;
+    output of later ranges is buffered until the earlier ones finish.
+    At most `queue_size` result chunks are in flight at once. Stopping
+    early terminates the workers; a worker that dies without reporting
+    (e.g. killed by a signal or the OOM killer) raises RuntimeError.
+    """
+    ranges = key_ranges(workers or os.cpu_count() or 1)
+    workers = len(ranges)
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue(queue_size)
+    procs = [
+        ctx.Process(target=_scan_range, daemon=True,
+                    args=(index, key_range, process, batch_size,
+                          row_format, results))
+        for index, key_range in enumerate(ranges)
+    ]
+    for proc in procs:
+        proc.start()
+
+    pending = {}  # index -> buffered output chunks (ordered mode)
+    done = set()
+    current = 0
+    try:
+        while len(done) < workers:
+            try:
+                index, kind, payload = results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                # A worker always reports before exiting normally, so a
+                # non-zero exit code without a report means it was killed.
+                for index, proc in enumerate(procs):
+                    if index not in done and proc.exitcode not in (None, 0):
+                        raise RuntimeError(
+                            f"Partition {index} worker died "
+                            f"(exit code {proc.exitcode})")
+                continue
+            if kind == _ERROR:
+                raise RuntimeError(f"Partition {index} failed: {payload}")
+            if kind == _DONE:
+                done.add(index)
+            elif not ordered:
+                yield from payload
+                continue
+            else:
+                pending.setdefault(index, []).append(payload)
+
+            if ordered:
+                while current < workers:
+                    for chunk in pending.pop(current, ()):
+                        yield from chunk
+                    if current not in done:
+                        break
+                    current += 1
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
@@ -5,10 +5,14 @@ and populate from user_data.csv
 """
 import os
 import csv
+import time
 import uuid
+import threading
+from contextlib import contextmanager
 import mysql.connector
 from dotenv import load_dotenv
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
 
 
 # Load environment variables
@@ -44,36 +48,251 @@ def create_database(conn):
             cur.close()
 
 
-def connect_to_prodev():
-    """Connects directly to the 'ALX_prodev' database."""
+def connect_to_prodev(allow_local_infile=False):
+    """Connects directly to the 'ALX_prodev' database.
+
+    Pass allow_local_infile=True to enable LOAD DATA LOCAL INFILE
+    on the returned connection (see insert_data).
+    """
     try:
-        conn = mysql.connector.connect(
-            database="ALX_prodev",
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST")
-        )
+        conn = _connect(allow_local_infile=allow_local_infile)
         if conn.is_connected():
-            print("Successfully connected to the 'ALX_prodev' database.")
             return conn
     except Error as e:
         print(f"Connection to 'ALX_prodev' failed: {e}")
     return None
 
 
+def _connect(**kwargs):
+    """Opens a new connection to 'ALX_prodev', raising Error on failure."""
+    return mysql.connector.connect(
+        database="ALX_prodev",
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        **kwargs
+    )
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of connections to 'ALX_prodev'.
+
+    Connections are created lazily up to `size`; callers beyond that
+    wait up to `timeout` seconds for one to be returned. A connection
+    idle for longer than `health_check_interval` seconds is pinged on
+    checkout and replaced if it has gone away. Connections returned with
+    unread results or an open transaction are cleaned up (or discarded)
+    before being reused.
+    """
+
+    def __init__(self, size=5, timeout=30.0, health_check_interval=30.0,
+                 connect=_connect):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._idle = []  # (connection, time returned), most recent last
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {"checkouts": 0, "creations": 0, "discards": 0,
+                       "health_check_failures": 0, "wait_time": 0.0,
+                       "max_wait_time": 0.0}
+
+    def get(self):
+        """Checks a connection out of the pool."""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise PoolError(
+                        f"No connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+            waited = time.perf_counter() - start
+            self._stats["checkouts"] += 1
+            self._stats["wait_time"] += waited
+            self._stats["max_wait_time"] = max(
+                self._stats["max_wait_time"], waited)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._open += 1
+
+        if conn is not None and not self._healthy(conn, returned_at):
+            self._close(conn)
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Error:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["creations"] += 1
+        return conn
+
+    def put(self, conn):
+        """Returns a connection to the pool, discarding it if unusable."""
+        try:
+            if conn.unread_result:
+                raise Error("Connection returned with unread results")
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and back in."""
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.put(conn)
+
+    def stats(self):
+        """Returns a snapshot of pool usage counters."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._open - len(self._idle)
+        return stats
+
+    def close(self):
+        """Closes every idle connection."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _healthy(self, conn, returned_at):
+        """Pings connections that have been idle for a while."""
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _discard(self, conn):
+        """Closes a checked-out connection and frees its slot."""
+        self._close(conn)
+        with self._cond:
+            self._open -= 1
+            self._stats["discards"] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(size=None):
+    """
+    Returns the process-wide ConnectionPool, creating it on first use.
+    Its size comes from `size`, else DB_POOL_SIZE, else 5.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                size=size or int(os.getenv("DB_POOL_SIZE", "5")))
+        return _pool
+
+
+def pooled_connection():
+    """Checks a connection out of the shared pool for a `with` block."""
+    return get_pool().connection()
+
+
+def pool_stats():
+    """Returns usage counters of the shared pool."""
+    return get_pool().stats()
+
+
+ROW_FORMATS = ("dict", "tuple", "namedtuple")
+
+
+def streaming_cursor(conn, row_format="dict"):
+    """
+    Returns an unbuffered cursor on conn that yields rows as dicts,
+    plain tuples or namedtuples. Unbuffered cursors leave the result
+    set on the server and only pull rows as they are fetched.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"Unknown row format: {row_format}")
+    return conn.cursor(buffered=False,
+                       dictionary=row_format == "dict",
+                       named_tuple=row_format == "namedtuple")
+
+
+def close_stream(cursor, conn=None):
+    """
+    Closes a streaming cursor and, if given, its connection. A consumer
+    that stops early leaves unread rows behind, which makes the cursor
+    refuse to close; dropping the connection discards them on the server
+    instead. Pooled connections are left to the pool, which discards
+    them itself when rows are left unread.
+    """
+    if cursor:
+        try:
+            cursor.close()
+        except Error:
+            pass
+    if conn:
+        conn.close()
+
+
+# user_id is stored as a 16-byte UUID and age as a one-byte integer.
+# The primary key already indexes user_id; the age index serves
+# age-range scans.
+USER_DATA_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_id BINARY(16) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        age TINYINT UNSIGNED NOT NULL,
+        updated_at TIMESTAMP(6) NOT NULL
+            DEFAULT CURRENT_TIMESTAMP(6)
+            ON UPDATE CURRENT_TIMESTAMP(6),
+        INDEX idx_age (age),
+        INDEX idx_updated_at (updated_at, user_id)
+    );
+"""
+
+# Select list that returns user_id in its text form. Keys compared
+# against user_id must go through UUID_TO_BIN(%s); byte order matches
+# the order of the text form, so keyset pagination is unaffected.
+USER_FIELDS = "BIN_TO_UUID(user_id) AS user_id, name, email, age"
+
+
 def create_table(conn):
     """Creates the 'user_data' table with the required schema and primary key index."""
     try:
         cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS user_data (
-                user_id CHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                age DECIMAL NOT NULL,
-                INDEX (user_id)
-            );
-        """)
+        cur.execute(USER_DATA_DDL.format(table="user_data"))
         conn.commit()
         print("Table 'user_data' successfully created or already exists.")
     except Error as e:
@@ -83,27 +302,189 @@ def create_table(conn):
             cur.close()
 
 
-def insert_data(conn, csv_file):
-    """Creates the 'user_data' table with the required schema and primary key index."""
+def migrate_user_data(conn):
+    """
+    Rebuilds a 'user_data' table that still uses the original schema
+    (CHAR(36) user_id, DECIMAL age, duplicate user_id index) into the
+    compact USER_DATA_DDL schema, then swaps it in atomically. The old
+    table is kept as 'user_data_old' until the caller drops it.
+    Returns True if a migration was performed.
+
+    'user_data' is write-locked from the start of the copy until the
+    swap (RENAME TABLE on locked tables needs MySQL 8.0.13+), so no
+    write is lost, but every other session, readers included, blocks
+    until the migration finishes: run it in a maintenance window.
+    """
+    cur = None
+    locked = False
     try:
         cur = conn.cursor()
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS user_data (
-                user_id CHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                age DECIMAL NOT NULL,
-                INDEX (user_id)
-            );
+            SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data'
+              AND COLUMN_NAME = 'user_id';
+        """)
+        row = cur.fetchone()
+        if not row or row[0] == "binary":
+            return False
+
+        add_change_tracking(conn)
+        cur.execute("DROP TABLE IF EXISTS user_data_new;")
+        cur.execute(USER_DATA_DDL.format(table="user_data_new"))
+        cur.execute("LOCK TABLES user_data WRITE, user_data_new WRITE;")
+        locked = True
+        cur.execute("""
+            INSERT INTO user_data_new
+                (user_id, name, email, age, updated_at)
+            SELECT UUID_TO_BIN(user_id), name, email, age, updated_at
+            FROM user_data;
+        """)
+        cur.execute("""
+            RENAME TABLE user_data TO user_data_old,
+                         user_data_new TO user_data;
         """)
         conn.commit()
-        print("Table 'user_data' successfully created or already exists.")
+        print("Migrated 'user_data' to the compact schema.")
+        return True
     except Error as e:
-        print(f"Error creating the 'user_data' table: {e}")
+        print(f"Error migrating the 'user_data' table: {e}")
+        conn.rollback()
+        return False
+    finally:
+        if cur:
+            if locked:
+                cur.execute("UNLOCK TABLES;")
+            cur.close()
+
+
+def add_change_tracking(conn):
+    """
+    Adds the 'updated_at' high-watermark column and its index to a
+    'user_data' table created before change tracking existed.
+    """
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data'
+              AND COLUMN_NAME = 'updated_at';
+        """)
+        (exists,) = cur.fetchone()
+        if not exists:
+            cur.execute("""
+                ALTER TABLE user_data
+                    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                        DEFAULT CURRENT_TIMESTAMP(6)
+                        ON UPDATE CURRENT_TIMESTAMP(6),
+                    ADD INDEX idx_updated_at (updated_at, user_id);
+            """)
+            conn.commit()
+            print("Added change tracking to 'user_data'.")
+    except Error as e:
+        print(f"Error adding change tracking to 'user_data': {e}")
+    finally:
+        if cur:
+            cur.close()
+
+
+def read_csv_in_batches(csv_file, batch_size):
+    """
+    Lazily reads csv_file and yields lists of at most batch_size
+    (user_id, name, email, age) tuples, generating a UUID for each row
+    in the 16-byte form stored by the user_id column.
+    Only one batch is held in memory at a time.
+    """
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip the header row
+        batch = []
+        for row in reader:
+            if len(row) != 3:
+                continue
+            name, email, age = row
+            batch.append((uuid.uuid4().bytes, name, email, age))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _load_data_infile(conn, csv_file):
+    """
+    Bulk loads csv_file with LOAD DATA LOCAL INFILE, letting the server
+    generate the user_id values. Returns the number of rows loaded.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            LOAD DATA LOCAL INFILE %s INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES
+            (name, email, age)
+            SET user_id = UUID_TO_BIN(UUID());
+        """, (os.path.abspath(csv_file),))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+
+
+def insert_data(conn, csv_file, batch_size=1000, use_load_data=False,
+                truncate=False):
+    """
+    Streams the rows of csv_file into the 'user_data' table.
+
+    Seeding is skipped if the table already holds rows, since every run
+    generates fresh user_id values and would otherwise duplicate them;
+    pass truncate=True to empty the table and load it again.
+
+    Rows are read in chunks of batch_size and inserted with a single
+    executemany per chunk, committing once per batch, so memory stays
+    flat regardless of the file size. With use_load_data=True the file
+    is handed to the server with LOAD DATA LOCAL INFILE instead; the
+    connection must then be opened with allow_local_infile=True.
+    Returns the number of rows inserted.
+    """
+    start = time.perf_counter()
+    total = 0
+    cur = None
+    try:
+        cur = conn.cursor()
+        if truncate:
+            cur.execute("TRUNCATE TABLE user_data;")
+        else:
+            cur.execute("SELECT 1 FROM user_data LIMIT 1;")
+            if cur.fetchall():
+                print("Table 'user_data' already has data; skipping seed.")
+                return 0
+        if use_load_data:
+            total = _load_data_infile(conn, csv_file)
+        else:
+            for batch in read_csv_in_batches(csv_file, batch_size):
+                cur.executemany(
+                    "INSERT INTO user_data (user_id, name, email, age) "
+                    "VALUES (%s, %s, %s, %s)",
+                    batch
+                )
+                conn.commit()
+                total += len(batch)
+    except (Error, OSError) as e:
+        print(f"Error inserting data from '{csv_file}': {e}")
+        if conn.is_connected():
+            conn.rollback()
     finally:
         if cur:
             cur.close()
 
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Inserted {total} rows into 'user_data' "
+          f"in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    return total
+
 
 if __name__ == "__main__":
     # Main execution flow
@@ -120,6 +501,7 @@ if __name__ == "__main__":
 
         if prodev_conn:
             create_table(prodev_conn)
+            migrate_user_data(prodev_conn)
             insert_data(prodev_conn, "user_data.csv")
             prodev_conn.close()
             print("Database connection closed.")